@@ -22,8 +22,15 @@ CHAIRMAN_MODEL = "google/gemini-3-pro-preview"
 # OpenRouter API endpoint
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Max OpenRouter requests in flight at once from query_models_parallel
+OPENROUTER_MAX_PARALLEL = max(1, int(os.getenv("OPENROUTER_MAX_PARALLEL", "8")))
+
 # Data directory for conversation storage
 DATA_DIR = "data/conversations"
+# Pretty-print (indent) conversation files for manual inspection; compact by default
+DEBUG_PRETTY_JSON = os.getenv("DEBUG_PRETTY_JSON", "false").lower() in ("1", "true", "yes")
+# zstd level for conversation files (needs the optional `zstandard` package); 0 writes plain JSON
+STORAGE_ZSTD_LEVEL = int(os.getenv("STORAGE_ZSTD_LEVEL", "0"))
 
 # Optional Ollama (local) settings
 # Set USE_OLLAMA=true in .env to enable local Ollama provider by default
@@ -32,6 +39,33 @@ OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 # If you prefer to call the Ollama CLI instead of the local HTTP API set this to true
 OLLAMA_USE_CLI = os.getenv("OLLAMA_USE_CLI", "false").lower() in ("1", "true", "yes")
 OLLAMA_CLI_PATH = os.getenv("OLLAMA_CLI_PATH", "ollama")
+# How long Ollama keeps a model loaded after a request ("10m"; "0" unloads immediately, "-1" pins it)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "10m")
+# Optional generation options forwarded to Ollama (unset/0 = server default)
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0")) or None
+OLLAMA_NUM_BATCH = int(os.getenv("OLLAMA_NUM_BATCH", "0")) or None
+# Max generation requests (streamed or not) sent to Ollama at once; match the server's OLLAMA_NUM_PARALLEL
+OLLAMA_MAX_CONCURRENT = max(1, int(os.getenv("OLLAMA_MAX_CONCURRENT", "4")))
+# Seconds to reuse an identical (model, prompt) reply; 0 disables the response cache
+OLLAMA_RESPONSE_CACHE_TTL = float(os.getenv("OLLAMA_RESPONSE_CACHE_TTL", "0"))
+# Negotiate HTTP/2 when the optional `h2` package is installed; set false if a proxy mishandles it
+HTTPX_HTTP2 = os.getenv("HTTPX_HTTP2", "true").lower() in ("1", "true", "yes")
+
+
+def http2_available() -> bool:
+    """Whether the shared HTTP clients should negotiate HTTP/2.
+
+    Needs the optional `h2` package (`pip install 'httpx[http2]'`); over TLS,
+    concurrent requests then multiplex on one connection while plain http://
+    stays on HTTP/1.1. HTTPX_HTTP2=false opts out entirely.
+    """
+    if not HTTPX_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
 # Recommended local Ollama models (used in UI to suggest installs)
 # Provide a mapping of popular families to suggested size variants so the
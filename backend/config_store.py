@@ -1,8 +1,8 @@
 """Persistent configuration store for council settings.
 
 This simple JSON store persists selected provider (openrouter/ollama), the
-council model list, and chairman model into `data/config.json` under the
-`DATA_DIR` directory.
+council model list, and chairman model into `_config.json` under the
+`DATA_DIR` directory (the '_' prefix keeps it apart from conversation files).
 """
 
 import json
@@ -12,7 +12,12 @@ from pathlib import Path
 
 from .config import DATA_DIR, COUNCIL_MODELS, CHAIRMAN_MODEL, USE_OLLAMA, OPENROUTER_API_KEY, OPENROUTER_API_URL
 
-CONFIG_PATH = os.path.join(DATA_DIR, 'config.json')
+CONFIG_PATH = os.path.join(DATA_DIR, '_config.json')
+# Where the config lived before internal files took the '_' prefix.
+_LEGACY_CONFIG_PATH = os.path.join(DATA_DIR, 'config.json')
+
+# Bumped on every save so callers can cache values derived from the config.
+_VERSION = 0
 
 
 def ensure_data_dir():
@@ -31,20 +36,32 @@ def _default_config() -> Dict[str, Any]:
 
 
 def get_config() -> Dict[str, Any]:
-    ensure_data_dir()
-    if not os.path.exists(CONFIG_PATH):
+    try:
+        with open(CONFIG_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    try:
+        os.replace(_LEGACY_CONFIG_PATH, CONFIG_PATH)
+    except FileNotFoundError:
         conf = _default_config()
         save_config(conf)
         return conf
-
     with open(CONFIG_PATH, 'r') as f:
         return json.load(f)
 
 
 def save_config(conf: Dict[str, Any]):
+    global _VERSION
     ensure_data_dir()
     with open(CONFIG_PATH, 'w') as f:
         json.dump(conf, f, indent=2)
+    _VERSION += 1
+
+
+def version() -> int:
+    """Return a counter that ticks whenever the config is written."""
+    return _VERSION
 
 
 def get_council_models() -> List[str]:
@@ -0,0 +1,54 @@
+"""Process-wide HTTP plumbing shared by the provider clients.
+
+`ollama` and `openrouter` each keep one pooled `httpx.AsyncClient` and cap
+how many queries they have in flight; both are created lazily, on first use
+inside the running event loop, and the client is closed on shutdown.
+"""
+
+import asyncio
+from typing import Callable, Optional
+
+import httpx
+
+
+class PooledClient:
+    """A lazily built `httpx.AsyncClient` reused by every request of one module.
+
+    `factory` builds the client on first use; `aclose()` closes it, and a later
+    `get()` builds a fresh one. Timeouts are left to each request.
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncClient]):
+        self._factory = factory
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def get(self) -> httpx.AsyncClient:
+        # No await between the check and the assignment, so no lock is needed
+        if self._client is None:
+            self._client = self._factory()
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+
+class LazySemaphore:
+    """An `asyncio.Semaphore` of `limit` slots, created on first use.
+
+    Use as `async with`; creating it inside the running loop keeps module
+    import free of event-loop state.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._limit)
+        await self._sem.acquire()
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
@@ -19,6 +19,26 @@ from .config import IMMEDIATE_CONTEXT_KEEP, SUMMARY_RETENTION
 app = FastAPI(title="LLM Council API")
 
 
+@app.on_event("startup")
+async def _startup():
+    # Warm the Ollama connection pool without delaying server start
+    ollama.schedule_warmup()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    from . import openrouter as openrouter_client
+    # write out conversation saves still waiting in the coalescing buffer first,
+    # so a failing client close can't lose them
+    try:
+        await storage.aflush()
+    finally:
+        try:
+            await ollama.aclose()
+        finally:
+            await openrouter_client.aclose()
+
+
 async def _background_summarize_and_persist(conversation_id: str, num_to_summarize: int, chair: str | None, provider: str | None):
     """Background task: summarize the oldest `num_to_summarize` assistant final answers and persist summary.
 
@@ -153,10 +173,10 @@ async def root():
 
 
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
-async def list_conversations():
-    """List all conversations (metadata only)."""
+async def list_conversations(limit: int | None = None):
+    """List conversations (metadata only), newest first; `limit` keeps only the newest N."""
     try:
-        return storage.list_conversations()
+        return await storage.alist_conversations(limit)
     except Exception as e:
         # Defensive: avoid 500 if storage has malformed files; return empty list
         print(f"Error listing conversations: {e}")
@@ -174,7 +194,7 @@ async def create_conversation(request: CreateConversationRequest):
 @app.get("/api/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(conversation_id: str):
     """Get a specific conversation with all its messages."""
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await storage.aget_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
@@ -858,23 +878,9 @@ async def get_council_config():
     recommended_objs = []
     installed_lc = [m.lower() for m in installed]
     def gen_candidate_names(family, variants):
-        candidates = []
-        # variants are full model names
-        candidates.extend(variants)
-        # add family itself and family:latest if not already
-        if family not in candidates:
-            candidates.append(family)
-        latest = f"{family}:latest"
-        if latest not in candidates:
-            candidates.append(latest)
+        # variants are full model names, then the family itself and family:latest;
         # dedupe preserving order
-        seen = []
-        out = []
-        for c in candidates:
-            if c not in seen:
-                seen.append(c)
-                out.append(c)
-        return out
+        return list(dict.fromkeys([*variants, family, f"{family}:latest"]))
 
     for family, variants in RECOMMENDED_OLLAMA_MODELS_MAP.items():
         chosen = _pick_variant(variants, specs)
@@ -12,41 +12,119 @@ Notes:
 """
 
 import asyncio
+import collections
+import hashlib
+import io
 import json
+import logging
+import re
 import shlex
+import shutil
 from typing import List, Dict, Any, Optional
 
 import httpx
 import time
 
-from .config import OLLAMA_API_URL, OLLAMA_USE_CLI, OLLAMA_CLI_PATH
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:  # optional: orjson parses the per-token NDJSON lines several times faster
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+from . import config_store
+from .http_pool import LazySemaphore, PooledClient
+from .config import (
+    OLLAMA_API_URL,
+    OLLAMA_USE_CLI,
+    OLLAMA_CLI_PATH,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_NUM_CTX,
+    OLLAMA_NUM_BATCH,
+    OLLAMA_MAX_CONCURRENT,
+    OLLAMA_RESPONSE_CACHE_TTL,
+    http2_available,
+)
+
+logger = logging.getLogger(__name__)
 
 # Detected API URL can be set at runtime if the configured OLLAMA_API_URL is not correct.
 _DETECTED_OLLAMA_API_URL: str | None = None
+# When the URL was detected (time.monotonic()); re-probed after _DISCOVERY_TTL seconds.
+_DETECTED_AT: float = 0.0
+_DISCOVERY_TTL = 300.0
+_DISCOVERY_LOCK = asyncio.Lock()
+
+_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+# Connections to the Ollama server; retries=1 redials once when connecting
+# fails, e.g. while a local server is still starting up.
+_HTTP = PooledClient(lambda: httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(retries=1, http2=http2_available(), limits=_HTTP_LIMITS),
+    timeout=120.0,
+))
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """The pooled client for discovery, generation, pulls and model listing."""
+    return _HTTP.get()
+
+
+async def aclose():
+    """Close the Ollama HTTP client (call from application shutdown)."""
+    await _HTTP.aclose()
 
 
 async def _validate_api_url(url: str, timeout: float = 1.0) -> bool:
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            candidates = [
-                url.rstrip('/'),
-                url.rstrip('/') + '/api/models',
-                url.rstrip('/') + '/models',
-                url.rstrip('/') + '/v1/models',
-            ]
-            for c in candidates:
-                try:
-                    r = await client.get(c)
-                    if r.status_code == 200:
-                        return True
-                except Exception:
-                    continue
-            return False
+        client = await _get_client()
+        candidates = [
+            url.rstrip('/'),
+            url.rstrip('/') + '/api/models',
+            url.rstrip('/') + '/models',
+            url.rstrip('/') + '/v1/models',
+        ]
+        for c in candidates:
+            try:
+                r = await client.get(c, timeout=timeout)
+                if r.status_code == 200:
+                    return True
+            except Exception:
+                continue
+        return False
     except Exception:
         return False
 
 
 async def _discover_api_url() -> str:
+    """Return the Ollama HTTP API URL, probing only when the cached one is missing or stale."""
+    if _DETECTED_OLLAMA_API_URL and time.monotonic() - _DETECTED_AT < _DISCOVERY_TTL:
+        return _DETECTED_OLLAMA_API_URL
+    async with _DISCOVERY_LOCK:
+        # another caller may have finished probing while we waited
+        if _DETECTED_OLLAMA_API_URL and time.monotonic() - _DETECTED_AT < _DISCOVERY_TTL:
+            return _DETECTED_OLLAMA_API_URL
+        return await _discover_api_url_once()
+
+
+def _invalidate_api_url():
+    """Forget the detected URL so the next request probes again."""
+    global _DETECTED_OLLAMA_API_URL
+    _DETECTED_OLLAMA_API_URL = None
+
+
+def _set_detected_api_url(url: str) -> str:
+    global _DETECTED_OLLAMA_API_URL, _DETECTED_AT
+    _DETECTED_OLLAMA_API_URL = url.rstrip('/')
+    _DETECTED_AT = time.monotonic()
+    return _DETECTED_OLLAMA_API_URL
+
+
+async def _discover_api_url_once() -> str:
     """Attempt to discover a working Ollama HTTP API URL.
 
     Strategy:
@@ -54,15 +132,10 @@ async def _discover_api_url() -> str:
     - If not, scan a small port range on localhost to find one that responds to `/api/models`.
     - Cache the detected URL in module variable.
     """
-    global _DETECTED_OLLAMA_API_URL
-    if _DETECTED_OLLAMA_API_URL:
-        return _DETECTED_OLLAMA_API_URL
-
     # 1) try configured env
     try:
         if OLLAMA_API_URL and await _validate_api_url(OLLAMA_API_URL, timeout=0.9):
-            _DETECTED_OLLAMA_API_URL = OLLAMA_API_URL.rstrip('/')
-            return _DETECTED_OLLAMA_API_URL
+            return _set_detected_api_url(OLLAMA_API_URL)
     except Exception:
         pass
 
@@ -73,18 +146,25 @@ async def _discover_api_url() -> str:
     # add a small range in case GUI runner used a different port
     for p in range(11400, 11451):
         candidates.append(f'http://localhost:{p}')
+    candidates = list(dict.fromkeys(candidates))
 
-    for c in candidates:
-        try:
-            if await _validate_api_url(c, timeout=0.6):
-                _DETECTED_OLLAMA_API_URL = c.rstrip('/')
-                return _DETECTED_OLLAMA_API_URL
-        except Exception:
-            continue
+    # Probe all candidates concurrently and take the first that answers, so a
+    # cold start with Ollama down costs one probe timeout rather than one per port.
+    tasks = [asyncio.create_task(_validate_api_url(c, timeout=0.6)) for c in candidates]
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # if several finish together, keep the candidate priority order
+            for c, t in zip(candidates, tasks):
+                if t in done and not t.cancelled() and t.result():
+                    return _set_detected_api_url(c)
+    finally:
+        for t in tasks:
+            t.cancel()
 
     # last resort: return configured value (may be wrong)
-    _DETECTED_OLLAMA_API_URL = OLLAMA_API_URL.rstrip('/') if OLLAMA_API_URL else 'http://localhost:11434'
-    return _DETECTED_OLLAMA_API_URL
+    return _set_detected_api_url(OLLAMA_API_URL or 'http://localhost:11434')
 
 
 def get_detected_api_url() -> str:
@@ -93,6 +173,45 @@ def get_detected_api_url() -> str:
         return _DETECTED_OLLAMA_API_URL
     return OLLAMA_API_URL
 
+
+_WARMUP_TASK: asyncio.Task | None = None
+
+
+async def _warmup():
+    """Discover the API URL and open a pooled connection before the first query.
+
+    The generate endpoint isn't probed here: only a real 2xx from
+    `_call_ollama_http` pins one, and stock Ollama's /api/generate is tried first.
+    """
+    try:
+        base = (await _discover_api_url()).rstrip('/')
+        client = await _get_client()
+        await client.get(base + '/api/tags', timeout=2.0)
+    except Exception:
+        pass
+
+
+# Providers under which queries can reach Ollama (hybrid routes by model name).
+_OLLAMA_PROVIDERS = ('ollama', 'local', 'hybrid')
+
+
+def schedule_warmup():
+    """Start the HTTP warm-up in the background (once), if an event loop is running.
+
+    No-op when the CLI transport is configured, when the configured provider
+    never queries Ollama, or outside an async context.
+    """
+    global _WARMUP_TASK
+    if OLLAMA_USE_CLI or _WARMUP_TASK is not None:
+        return
+    # best effort: a bad config or a missing loop must never stop the server from starting
+    try:
+        if str(config_store.get_provider()).lower() not in _OLLAMA_PROVIDERS:
+            return
+        _WARMUP_TASK = asyncio.get_running_loop().create_task(_warmup())
+    except Exception:
+        return
+
 # Try multiple endpoints for Ollama generation
 OLLAMA_GENERATE_ENDPOINTS = [
     '/api/generate',
@@ -103,248 +222,322 @@ OLLAMA_GENERATE_ENDPOINTS = [
     '/v1/completions',
 ]
 
+# HTTP endpoints that may accept a model pull, in preference order
+OLLAMA_PULL_ENDPOINTS = [
+    '/api/pull',
+    '/v1/pull',
+    '/pull',
+    '/api/models/pull',
+]
+
 # Try CLI subcommands for generation (avoid unsupported commands like 'predict' on some versions)
 OLLAMA_CLI_GENERATE_CMDS = ['generate', 'run']
 OLLAMA_CLI_UNINSTALL_CMDS = ['rm', 'remove', 'uninstall']
+OLLAMA_CLI_LIST_CMDS = ['list', 'ls']
+
+# Resolved location of the CLI binary, looked up once (re-checked while still missing).
+_CLI_PATH_RESOLVED: str | None = shutil.which(OLLAMA_CLI_PATH)
+
+
+def _cli_path() -> str | None:
+    """Full path of the Ollama CLI, or None when it is not installed."""
+    global _CLI_PATH_RESOLVED
+    if _CLI_PATH_RESOLVED is None:
+        _CLI_PATH_RESOLVED = shutil.which(OLLAMA_CLI_PATH)
+    return _CLI_PATH_RESOLVED
+
+# Remember which CLI listing subcommand worked so later calls spawn only one process.
+_CLI_LIST_WINNER: str | None = None
+# Same for the generation subcommand used by `_call_ollama_cli`.
+_CLI_GEN_WINNER: str | None = None
+
+# Working (endpoint, payload-variant index) for HTTP generation, keyed by API base URL.
+_GENERATE_WINNER: Dict[str, tuple[str, int]] = {}
+# Pull URL that last succeeded, keyed by API base URL.
+_PULL_WINNER: Dict[str, str] = {}
+
+
+# Full endpoint URLs per API base, built once: base -> {endpoint: url}.
+_ENDPOINTS_BY_BASE: Dict[str, Dict[str, str]] = {}
+
+
+def _endpoint_urls(base: str) -> Dict[str, str]:
+    """Map every generate and pull endpoint to its full URL under `base`."""
+    urls = _ENDPOINTS_BY_BASE.get(base)
+    if urls is None:
+        urls = {e: base + e for e in (*OLLAMA_GENERATE_ENDPOINTS, *OLLAMA_PULL_ENDPOINTS)}
+        _ENDPOINTS_BY_BASE[base] = urls
+    return urls
+
+
+def _pull_urls(base: str) -> List[str]:
+    """Candidate pull URLs for `base`, with the last one that worked first."""
+    by_endpoint = _endpoint_urls(base)
+    urls = [by_endpoint[e] for e in OLLAMA_PULL_ENDPOINTS]
+    winner = _PULL_WINNER.get(base)
+    if winner in urls:
+        urls.remove(winner)
+        urls.insert(0, winner)
+    return urls
+
+
+def _generation_params(keep_alive: Optional[str] = None) -> Dict[str, Any]:
+    """Extra payload fields that keep the model resident between calls.
+
+    `keep_alive` overrides OLLAMA_KEEP_ALIVE (e.g. "0" to unload right away, "-1" to pin).
+    """
+    params: Dict[str, Any] = {"keep_alive": keep_alive if keep_alive is not None else OLLAMA_KEEP_ALIVE}
+    options = {}
+    if OLLAMA_NUM_CTX:
+        options["num_ctx"] = OLLAMA_NUM_CTX
+    if OLLAMA_NUM_BATCH:
+        options["num_batch"] = OLLAMA_NUM_BATCH
+    if options:
+        params["options"] = options
+    return params
+
+
+def _extract(obj: Any) -> Optional[str]:
+    """Pull the generated text out of one decoded Ollama reply.
+
+    Replies vary by version: 'response' (standard API), 'result', 'generated'
+    (list of dicts with 'text') or 'data'. Returns None when none is present.
+    """
+    if not isinstance(obj, dict):
+        return None
+    if isinstance(obj.get('response'), str):
+        return obj['response']
+    if isinstance(obj.get('result'), str):
+        return obj['result']
+    if isinstance(obj.get('generated'), list):
+        return '\n'.join(
+            (g.get('text') or g.get('output') or '') if isinstance(g, dict) else str(g)
+            for g in obj['generated']
+        )
+    if 'data' in obj:
+        try:
+            return json.dumps(obj['data'])
+        except Exception:
+            return str(obj['data'])
+    return None
 
 
-async def _call_ollama_http(model: str, prompt: str, timeout: float = 120.0) -> Optional[Dict[str, Any]]:
+async def _call_ollama_http(model: str, prompt: str, timeout: float = 120.0, keep_alive: Optional[str] = None) -> Optional[Dict[str, Any]]:
     base = (await _discover_api_url()).rstrip('/')
+    params = _generation_params(keep_alive)
     # Try payload variants to support different Ollama API versions
     payload_variants = [
-        {"model": model, "prompt": prompt},
-        {"model": model, "input": prompt},
-        {"model": model, "messages": [{"role": "user", "content": prompt}]},
+        {"model": model, "prompt": prompt, **params},
+        {"model": model, "input": prompt, **params},
+        {"model": model, "messages": [{"role": "user", "content": prompt}], **params},
     ]
-    payload = {
-        "model": model,
-        "prompt": prompt,
-    }
 
     try:
         data = None
         resp = None
         start = time.time()
-        print(f"[OLLAMA][HTTP] start model={model} url_base={base} timeout={timeout}")
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for endpoint in OLLAMA_GENERATE_ENDPOINTS:
-                url = base + endpoint
-                for payload in payload_variants:
-                    try:
-                        resp = await client.post(url, json=payload)
-                        resp.raise_for_status()
-                        # Response can be JSON or text, parse after
-                        # We'll attempt to parse JSON below
-                        break
-                    except Exception:
-                        resp = None
-                        continue
+        logger.debug("[OLLAMA][HTTP] start model=%s url_base=%s timeout=%s", model, base, timeout)
+        client = await _get_client()
+        urls = _endpoint_urls(base)
+        # Try the (endpoint, payload variant) that worked last time for this base first
+        combos = [(e, i) for e in OLLAMA_GENERATE_ENDPOINTS for i in range(len(payload_variants))]
+        winner = _GENERATE_WINNER.get(base)
+        if winner in combos:
+            combos.remove(winner)
+            combos.insert(0, winner)
+        # Each variant is serialized once, on first use, however many endpoints it is tried against
+        encoded: Dict[int, bytes] = {}
+        for endpoint, idx in combos:
+            try:
+                body = encoded.get(idx)
+                if body is None:
+                    body = encoded[idx] = _dumps(payload_variants[idx])
+                request = client.build_request('POST', urls[endpoint], content=body, headers=_JSON_HEADERS, timeout=timeout)
+                resp = await client.send(request, stream=True)
+                resp.raise_for_status()
+            except Exception:
                 if resp is not None:
+                    await resp.aclose()
+                resp = None
+                continue
+            # Response can be JSON or (ND)JSON text, parsed below as it streams in
+            _GENERATE_WINNER[base] = (endpoint, idx)
+            break
+        if resp is None:
+            raise Exception("No Ollama generate endpoint accepted our request")
+
+        logger.debug("[OLLAMA][HTTP] status=%s http_version=%s", resp.status_code, resp.http_version)
+        ct = resp.headers.get('content-type', '').lower()
+        if 'json' in ct and 'ndjson' not in ct and 'event-stream' not in ct:
+            # Declared as one JSON document (non-streaming reply): parse the body in one go
+            try:
+                body = await resp.aread()
+            finally:
+                await resp.aclose()
+            try:
+                data = _loads(body)
+            except ValueError:
+                data = body.decode('utf-8', 'replace')
+        else:
+            # Read line by line instead of buffering the whole body: streamed token
+            # fragments go straight into `buf`, and only non-JSON lines are kept in
+            # `raw` for the plain-text fallback.
+            buf = io.StringIO()
+            raw = io.StringIO()
+            first_obj = None
+            nlines = 0
+            try:
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    nlines += 1
                     try:
-                        # Debug: log status and a short preview of body length
-                        try:
-                            body_preview = resp.text[:400]
-                        except Exception:
-                            body_preview = '<unreadable>'
-                        print(f"[OLLAMA][HTTP] got response status={resp.status_code} body_len={len(resp.text or '')} preview={body_preview}")
-                        data = resp.json()
-                        break
+                        obj = _loads(line)
                     except ValueError:
-                        # not JSON: try to parse NDJSON or fallback to raw text
-                        text = resp.text
-                        lines = [l for l in text.splitlines() if l.strip()]
-                        # Accumulate streaming NDJSON fragments into a single response
-                        fragments = []
-                        for line in lines:
-                            try:
-                                obj = json.loads(line)
-                                if isinstance(obj, dict):
-                                    # prefer 'result' or 'generated' if present
-                                    if 'result' in obj and isinstance(obj['result'], str):
-                                        fragments.append(obj['result'])
-                                        continue
-                                    if 'generated' in obj and isinstance(obj['generated'], list):
-                                        for g in obj['generated']:
-                                            if isinstance(g, dict):
-                                                fragments.append(g.get('text') or g.get('output') or '')
-                                            else:
-                                                fragments.append(str(g))
-                                        continue
-                                    if 'response' in obj and isinstance(obj['response'], str):
-                                        fragments.append(obj['response'])
-                                        continue
-                                    if 'data' in obj:
-                                        try:
-                                            fragments.append(json.dumps(obj['data']))
-                                        except Exception:
-                                            fragments.append(str(obj['data']))
-                                        continue
-                            except Exception:
-                                continue
-                        if fragments:
-                            combined = ''.join(fragments)
-                            return {'content': combined}
-                        # fallback: set data from raw text to be stringified by caller
-                        # If no JSON and raw text present, capture it
-                        data = text
-                        print(f"[OLLAMA][HTTP] raw text length={len(text)} preview={text[:400]}")
-                        break
-            if data is None and resp is None:
-                raise Exception("No Ollama generate endpoint accepted our request")
-            # if data is already a dict (json), we've got it; if data is text, we'll stringify
-
-            # Ollama responses vary by version; attempt to extract text sensibly.
-            # Common keys: 'response', 'result', 'data', or 'generated'. We'll try a few fallbacks.
-            if isinstance(data, dict):
-                # If there's a top-level 'response' string (standard Ollama API format)
-                if 'response' in data and isinstance(data['response'], str):
-                    return {'content': data['response']}
-                
-                # If there's a top-level 'result' string
-                if 'result' in data and isinstance(data['result'], str):
-                    return {'content': data['result']}
-
-                # If 'generated' exists (list of dicts with 'text')
-                if 'generated' in data and isinstance(data['generated'], list):
-                    texts = []
-                    for g in data['generated']:
-                        if isinstance(g, dict):
-                            text = g.get('text') or g.get('output') or ''
-                            texts.append(text)
-                        else:
-                            texts.append(str(g))
-                    return {'content': '\n'.join(texts)}
-
-                # If 'data' contains items
-                if 'data' in data:
-                    try:
-                        return {'content': json.dumps(data['data'])}
-                    except Exception:
-                        return {'content': str(data['data'])}
-
-            # Fallback: stringify entire response
-            out = {'content': json.dumps(data)}
-            dur = time.time() - start
-            # Log a truncated preview of the content for debugging
-            try:
-                preview = out.get('content', '')
-                if isinstance(preview, str) and len(preview) > 400:
-                    preview = preview[:400] + '...'
-            except Exception:
-                preview = '<unprintable>'
-            print(f"[OLLAMA][HTTP] finish model={model} duration={dur:.2f}s success=True preview={preview}")
-            return out
+                        if raw.tell():
+                            raw.write('\n')
+                        raw.write(line)
+                        continue
+                    if nlines == 1:
+                        first_obj = obj
+                    fragment = _extract(obj)
+                    if fragment is not None:
+                        buf.write(fragment)
+            finally:
+                await resp.aclose()
+
+            if nlines == 1 and first_obj is not None:
+                # a single JSON document (non-streaming reply)
+                data = first_obj
+            else:
+                combined = buf.getvalue()
+                if combined:
+                    return {'content': combined}
+                # fallback: set data from raw text to be stringified below
+                text = raw.getvalue()
+                try:
+                    data = _loads(text)
+                except ValueError:
+                    data = text
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("[OLLAMA][HTTP] raw text length=%s preview=%s", len(text), text[:400])
+        # if data is already a dict (json), we've got it; if data is text, we'll stringify
+
+        content = _extract(data)
+        if content is not None:
+            return {'content': content}
+
+        # Fallback: stringify entire response
+        out = {'content': json.dumps(data)}
+        # Log a truncated preview of the content for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            preview = out['content']
+            if len(preview) > 400:
+                preview = preview[:400] + '...'
+            logger.debug("[OLLAMA][HTTP] finish model=%s duration=%.2fs preview=%s", model, time.time() - start, preview)
+        return out
     except Exception as e:
         dur = time.time() - start if 'start' in locals() else 0.0
-        print(f"[OLLAMA][HTTP] error model={model} duration={dur:.2f}s error={e}")
+        logger.error("[OLLAMA][HTTP] error model=%s duration=%.2fs error=%s", model, dur, e)
+        # the server may have moved (e.g. restarted on another port): re-probe next time
+        _invalidate_api_url()
         return None
 
 
+async def _run_subprocess(cmd: List[str], timeout: float, stdin_bytes: Optional[bytes] = None) -> tuple[int, bytes, bytes]:
+    """Run `cmd` to completion and return (returncode, stdout, stderr).
+
+    Raises FileNotFoundError if the binary is missing and asyncio.TimeoutError
+    if it does not finish in time. Either way the child is killed, reaped and
+    its pipes closed, so repeated timeouts cannot leak zombies or descriptors.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin_bytes is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(input=stdin_bytes), timeout=timeout)
+        return proc.returncode, stdout, stderr
+    finally:
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            if proc.stdin is not None:
+                proc.stdin.close()
+            # Grandchildren may still hold the stdout/stderr pipes open; close
+            # the transport so our ends are released regardless.
+            transport = getattr(proc, '_transport', None)
+            if transport is not None:
+                transport.close()
+
+
 async def _call_ollama_cli(model: str, prompt: str, timeout: float = 120.0) -> Optional[Dict[str, Any]]:
     """Invoke the Ollama CLI as a fallback. This is a best-effort approach.
 
-    It calls: `ollama generate <model> --prompt '<prompt>' --quiet` and captures stdout.
+    It calls e.g. `ollama run <model> --format json`, feeding the prompt over
+    stdin (so large prompts never hit ARG_MAX or show up in process listings)
+    and captures stdout.
     """
+    global _CLI_GEN_WINNER
     try:
         start = time.time()
-        print(f"[OLLAMA][CLI] start model={model} timeout={timeout} cmds={OLLAMA_CLI_GENERATE_CMDS}")
-        # Try common CLI subcommands in order: generate, run
+        # Try the subcommand that worked last time first, then the rest in order: generate, run
+        subcmds = OLLAMA_CLI_GENERATE_CMDS
+        if _CLI_GEN_WINNER:
+            subcmds = [_CLI_GEN_WINNER] + [c for c in OLLAMA_CLI_GENERATE_CMDS if c != _CLI_GEN_WINNER]
+        logger.debug("[OLLAMA][CLI] start model=%s timeout=%s cmds=%s", model, timeout, subcmds)
         last_err = None
-        for subcmd in OLLAMA_CLI_GENERATE_CMDS:
+        prompt_bytes = prompt.encode()
+        for subcmd in subcmds:
             if subcmd == 'run':
-                cmd = [OLLAMA_CLI_PATH, 'run', model, prompt, '--format', 'json']
-            elif subcmd == 'generate':
-                cmd = [OLLAMA_CLI_PATH, 'generate', model, '--prompt', prompt]
+                cmd = [OLLAMA_CLI_PATH, 'run', model, '--format', 'json']
             else:
-                cmd = [OLLAMA_CLI_PATH, subcmd, model, prompt]
+                cmd = [OLLAMA_CLI_PATH, subcmd, model]
 
             # Use asyncio subprocess to not block the loop
             try:
-                proc = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
+                returncode, stdout, stderr = await _run_subprocess(cmd, timeout, stdin_bytes=prompt_bytes)
             except FileNotFoundError:
                 last_err = f"Ollama CLI not found at: {OLLAMA_CLI_PATH}"
                 break
-
-            try:
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
             except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
                 last_err = 'Timeout waiting for CLI'
+                if subcmd == _CLI_GEN_WINNER:
+                    # the known-good subcommand is just slow; spawning others won't help
+                    break
                 continue
-            if proc.returncode == 0:
+            if returncode == 0:
+                _CLI_GEN_WINNER = subcmd
                 text = stdout.decode(errors='ignore')
-                # Try parsing as JSON or NDJSON
+                # Try parsing as a single JSON document first, then as NDJSON;
+                # only lines that look like objects are handed to the parser.
                 try:
-                    obj = json.loads(text)
-                    # similar parsing as HTTP path
-                    if isinstance(obj, dict):
-                        if 'result' in obj and isinstance(obj['result'], str):
-                            return {'content': obj['result']}
-                        if 'generated' in obj and isinstance(obj['generated'], list):
-                            texts = []
-                            for g in obj['generated']:
-                                if isinstance(g, dict):
-                                    texts.append(g.get('text') or g.get('output') or '')
-                                else:
-                                    texts.append(str(g))
-                            return {'content': '\n'.join(texts)}
-                        if 'response' in obj and isinstance(obj['response'], str):
-                            return {'content': obj['response']}
-                        if 'data' in obj:
-                            return {'content': json.dumps(obj['data'])}
-                    # fallback to raw text
-                    # Log a truncated preview
-                    try:
-                        preview = text if len(text) <= 400 else text[:400] + '...'
-                    except Exception:
-                        preview = '<unprintable>'
-                    dur = time.time() - start
-                    print(f"[OLLAMA][CLI] finish model={model} duration={dur:.2f}s success=True preview={preview}")
-                    return {'content': text}
-                except Exception:
-                    # Might be ndjson or plain text - split and inspect lines
-                    lines = [l for l in text.splitlines() if l.strip()]
+                    content = _extract(_loads(stdout))
+                except ValueError:
                     fragments = []
-                    for line in lines:
+                    for line in stdout.splitlines():
+                        line = line.strip()
+                        if not line.startswith(b'{'):
+                            continue
                         try:
-                            obj = json.loads(line)
-                            if isinstance(obj, dict):
-                                if 'result' in obj and isinstance(obj['result'], str):
-                                    fragments.append(obj['result'])
-                                    continue
-                                if 'generated' in obj and isinstance(obj['generated'], list):
-                                    for g in obj['generated']:
-                                        if isinstance(g, dict):
-                                            fragments.append(g.get('text') or g.get('output') or '')
-                                        else:
-                                            fragments.append(str(g))
-                                    continue
-                                if 'response' in obj and isinstance(obj['response'], str):
-                                    fragments.append(obj['response'])
-                                    continue
-                                if 'data' in obj:
-                                    try:
-                                        fragments.append(json.dumps(obj['data']))
-                                    except Exception:
-                                        fragments.append(str(obj['data']))
-                                    continue
-                        except Exception:
+                            fragment = _extract(_loads(line))
+                        except ValueError:
                             continue
-                    if fragments:
-                        combined = ''.join(fragments)
-                        return {'content': combined}
-                    try:
-                        preview = text if len(text) <= 400 else text[:400] + '...'
-                    except Exception:
-                        preview = '<unprintable>'
-                    dur = time.time() - start
-                    print(f"[OLLAMA][CLI] finish model={model} duration={dur:.2f}s success=True preview={preview}")
-                    return {'content': text}
+                        if fragment is not None:
+                            fragments.append(fragment)
+                    content = ''.join(fragments) if fragments else None
+                if content is not None:
+                    return {'content': content}
+                # fallback to raw text
+                if logger.isEnabledFor(logging.DEBUG):
+                    preview = text if len(text) <= 400 else text[:400] + '...'
+                    logger.debug("[OLLAMA][CLI] finish model=%s duration=%.2fs success=True preview=%s", model, time.time() - start, preview)
+                return {'content': text}
             else:
                 last_err = stderr.decode(errors='ignore')
                 # try next subcommand
@@ -352,24 +545,56 @@ async def _call_ollama_cli(model: str, prompt: str, timeout: float = 120.0) -> O
         # If we get here, none worked
         dur = time.time() - start
         if last_err:
-            print(f"[OLLAMA][CLI] none succeeded model={model} duration={dur:.2f}s last_err={last_err}")
+            logger.error("[OLLAMA][CLI] none succeeded model=%s duration=%.2fs last_err=%s", model, dur, last_err)
         else:
-            print(f"[OLLAMA][CLI] none succeeded model={model} duration={dur:.2f}s")
+            logger.error("[OLLAMA][CLI] none succeeded model=%s duration=%.2fs", model, dur)
         return None
 
     except FileNotFoundError:
-        print(f"[OLLAMA][CLI] not found at path: {OLLAMA_CLI_PATH}")
+        logger.error("[OLLAMA][CLI] not found at path: %s", OLLAMA_CLI_PATH)
         return None
     except Exception as e:
-        print(f"[OLLAMA][CLI] error model={model} error={e}")
+        logger.error("[OLLAMA][CLI] error model=%s error=%s", model, e)
         return None
 
 
+# Template for one message when flattening a chat history into a prompt.
+_PROMPT_LINE = '[%s] %s'
+
+# In-flight non-streaming queries keyed by `_request_key`.
+_INFLIGHT: Dict[bytes, asyncio.Future] = {}
+
+# Recent non-streaming replies keyed by `_request_key`: key -> (stored_at, result).
+# Only used when OLLAMA_RESPONSE_CACHE_TTL > 0; least recently used entries go first.
+_RESP_CACHE: collections.OrderedDict[bytes, tuple[float, Dict[str, Any]]] = collections.OrderedDict()
+_RESP_CACHE_MAX = 256
+
+
+def _build_prompt(messages: List[Dict[str, str]]) -> str:
+    """Convert messages into a single prompt string."""
+    return '\n\n'.join(_PROMPT_LINE % (m.get('role', 'user'), m.get('content', '')) for m in messages)
+
+
+def _request_key(model: str, prompt: str, keep_alive: Optional[str] = None) -> bytes:
+    """Compact hash identifying a (model, prompt, keep_alive) request.
+
+    `keep_alive` is part of the key (None meaning OLLAMA_KEEP_ALIVE) so a caller
+    asking for a different residency, e.g. "0" to unload, sends its own request.
+    """
+    h = hashlib.blake2b(model.encode(), digest_size=16)
+    h.update(b'\0')
+    h.update((keep_alive if keep_alive is not None else OLLAMA_KEEP_ALIVE).encode())
+    h.update(b'\0')
+    h.update(prompt.encode())
+    return h.digest()
+
+
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
     timeout: float = 120.0,
-    stream: bool = False
+    stream: bool = False,
+    keep_alive: Optional[str] = None,
 ):
     """Query a model served by Ollama.
 
@@ -381,21 +606,45 @@ async def query_model(
         messages: List of message dicts with 'role' and 'content'
         timeout: Request timeout in seconds
         stream: If True, returns an async generator yielding chunks. If False, returns complete response dict.
+        keep_alive: How long Ollama keeps the model loaded afterwards (defaults to OLLAMA_KEEP_ALIVE)
     
     Returns:
         If stream=False: Dict with 'content' key, or None on error
         If stream=True: Async generator yielding chunk dicts
     """
-    # Convert messages into a single prompt string
-    prompt = '\n\n'.join([f"[{m.get('role','user')}] {m.get('content','')}" for m in messages])
+    prompt = _build_prompt(messages)
 
     if stream:
-        return _query_model_stream_generator(model, prompt, timeout)
-    
-    # Non-streaming mode - original implementation
-    print(f"[OLLAMA] query_model: model={model} use_cli={OLLAMA_USE_CLI}")
+        return _query_model_stream_generator(model, prompt, timeout, keep_alive)
+
+    # Single-flight: concurrent identical (model, prompt, keep_alive) queries share one request.
+    # The shared task is shielded so one caller's cancellation doesn't affect the others.
+    key = _request_key(model, prompt, keep_alive)
+    if OLLAMA_RESPONSE_CACHE_TTL > 0:
+        hit = _RESP_CACHE.get(key)
+        if hit is not None and time.monotonic() - hit[0] < OLLAMA_RESPONSE_CACHE_TTL:
+            _RESP_CACHE.move_to_end(key)
+            return dict(hit[1])
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_query_model_once(model, prompt, timeout, keep_alive))
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _t: _INFLIGHT.pop(key, None))
+    result = await asyncio.shield(task)
+    if result is not None and OLLAMA_RESPONSE_CACHE_TTL > 0:
+        _RESP_CACHE[key] = (time.monotonic(), result)
+        _RESP_CACHE.move_to_end(key)
+        while len(_RESP_CACHE) > _RESP_CACHE_MAX:
+            _RESP_CACHE.popitem(last=False)
+    # hand each caller its own dict so one caller's edits can't leak to another
+    return dict(result) if result is not None else None
+
+
+async def _query_model_once(model: str, prompt: str, timeout: float, keep_alive: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Run one non-streaming query over HTTP, falling back to the CLI."""
+    logger.debug("[OLLAMA] query_model: model=%s use_cli=%s", model, OLLAMA_USE_CLI)
     if not OLLAMA_USE_CLI:
-        result = await _call_ollama_http(model, prompt, timeout=timeout)
+        result = await _call_ollama_http(model, prompt, timeout=timeout, keep_alive=keep_alive)
         if result is not None:
             return result
 
@@ -413,33 +662,39 @@ async def query_model(
     return None
 
 
-async def _query_model_stream_generator(model: str, prompt: str, timeout: float):
-    """Helper generator for streaming Ollama response."""
+async def _query_model_stream_generator(model: str, prompt: str, timeout: float, keep_alive: Optional[str] = None):
+    """Helper generator for streaming Ollama response; holds a concurrency slot while it runs."""
     base = (await _discover_api_url()).rstrip('/')
     payload = {
         "model": model,
         "prompt": prompt,
-        "stream": True
+        "stream": True,
+        **_generation_params(keep_alive),
     }
+    body = _dumps(payload)
     
-    try:
-        start = time.time()
-        print(f"[OLLAMA][STREAM] start model={model} url_base={base}")
+    # streamed queries count against the same cap as query_models_parallel,
+    # since the UI's stage fan-out streams one request per council model
+    async with _QUERY_SLOTS:
+        try:
+            start = time.time()
+            logger.debug("[OLLAMA][STREAM] start model=%s url_base=%s", model, base)
         
-        async with httpx.AsyncClient(timeout=timeout) as client:
+            client = await _get_client()
+            urls = _endpoint_urls(base)
             for endpoint in OLLAMA_GENERATE_ENDPOINTS:
-                url = base + endpoint
+                url = urls[endpoint]
                 try:
-                    async with client.stream('POST', url, json=payload) as resp:
+                    async with client.stream('POST', url, content=body, headers=_JSON_HEADERS, timeout=timeout) as resp:
                         if resp.status_code != 200:
                             continue
-                            
+                        
                         # Stream NDJSON response
                         async for line in resp.aiter_lines():
                             if not line.strip():
                                 continue
                             try:
-                                obj = json.loads(line)
+                                obj = _loads(line)
                                 if isinstance(obj, dict):
                                     # Check if this chunk has response text
                                     if 'response' in obj and isinstance(obj['response'], str):
@@ -451,43 +706,113 @@ async def _query_model_stream_generator(model: str, prompt: str, timeout: float)
                                     # Check if stream is complete
                                     if obj.get('done', False):
                                         dur = time.time() - start
-                                        print(f"[OLLAMA][STREAM] complete model={model} duration={dur:.2f}s")
+                                        logger.debug("[OLLAMA][STREAM] complete model=%s duration=%.2fs", model, dur)
                                         yield {'type': 'done'}
                                         return
                             except json.JSONDecodeError:
                                 continue
-                        
+                    
                         # If we got here, streaming worked
                         return
-                        
+                    
                 except Exception:
                     # Try next endpoint
                     continue
         
-        # If no endpoint worked, fall back to non-streaming
-        print(f"[OLLAMA][STREAM] no streaming endpoint worked, falling back to non-streaming")
-        # We can't call query_model(stream=False) easily here without circular dependency or code duplication
-        # But we can try _call_ollama_http directly
-        result = await _call_ollama_http(model, prompt, timeout=timeout)
-        if result and 'content' in result:
-            yield {'type': 'chunk', 'content': result['content'], 'done': True}
-            yield {'type': 'done'}
-        else:
-            yield {'type': 'error', 'message': 'Failed to get response'}
+            # If no endpoint worked, fall back to non-streaming
+            logger.warning("[OLLAMA][STREAM] no streaming endpoint worked, falling back to non-streaming")
+            # We can't call query_model(stream=False) easily here without circular dependency or code duplication
+            # But we can try _call_ollama_http directly
+            result = await _call_ollama_http(model, prompt, timeout=timeout, keep_alive=keep_alive)
+            if result and 'content' in result:
+                yield {'type': 'chunk', 'content': result['content'], 'done': True}
+                yield {'type': 'done'}
+            else:
+                yield {'type': 'error', 'message': 'Failed to get response'}
             
-    except Exception as e:
-        dur = time.time() - start if 'start' in locals() else 0.0
-        print(f"[OLLAMA][STREAM] error model={model} duration={dur:.2f}s error={e}")
-        yield {'type': 'error', 'message': str(e)}
+        except Exception as e:
+            dur = time.time() - start if 'start' in locals() else 0.0
+            logger.error("[OLLAMA][STREAM] error model=%s duration=%.2fs error=%s", model, dur, e)
+            yield {'type': 'error', 'message': str(e)}
+
+
 
+# Generation requests in flight to Ollama, from query_models_parallel and
+# streamed queries alike; a single GPU only runs OLLAMA_NUM_PARALLEL at once.
+_QUERY_SLOTS = LazySemaphore(OLLAMA_MAX_CONCURRENT)
 
 
 async def query_models_parallel(models: List[str], messages: List[Dict[str, str]]) -> Dict[str, Optional[Dict[str, Any]]]:
-    import asyncio
+    # Submit only as many requests as the server actually runs in parallel;
+    # the rest would just queue up server-side holding pooled connections.
+    async def _run(model: str):
+        async with _QUERY_SLOTS:
+            return await query_model(model, messages)
+
+    # Group by model: a model listed twice gets the same prompt, so one request serves both.
+    unique = list(dict.fromkeys(models))
+    # A model that errors or isn't installed maps to None; the stage goes on with the rest
+    responses = await asyncio.gather(*(_run(model) for model in unique), return_exceptions=True)
+    return {
+        model: (None if isinstance(resp, BaseException) else resp)
+        for model, resp in zip(unique, responses)
+    }
+
 
-    tasks = [query_model(model, messages) for model in models]
-    responses = await asyncio.gather(*tasks)
-    return {model: resp for model, resp in zip(models, responses)}
+# Install candidate names per requested model: name -> (built_at, candidates).
+_CAND_CACHE: Dict[str, tuple[float, List[str]]] = {}
+_CAND_TTL = 300.0
+
+
+async def _build_candidates(name: str) -> List[str]:
+    """Prioritized list of names to try when installing `name`.
+
+    Combines a few heuristic canonicalizations with a registry search; the
+    result is cached for `_CAND_TTL` seconds so retries skip the registry probe.
+    """
+    now = time.monotonic()
+    cached = _CAND_CACHE.get(name)
+    if cached is not None and now - cached[0] < _CAND_TTL:
+        return list(cached[1])
+
+    candidates = []
+    seen = set()
+
+    def _add(n: str):
+        if not n:
+            return
+        if n in seen:
+            return
+        seen.add(n)
+        candidates.append(n)
+
+    # If user provided explicit tag (contains ':'), try it first
+    if ':' in name:
+        _add(name)
+        # also try without tag
+        _add(name.split(':', 1)[0])
+    else:
+        _add(name)
+        _add(f"{name}:latest")
+
+    # If name looks like 'family-variant' also try 'family:variant' and 'family/variant'
+    if '-' in name and ':' not in name:
+        family, rest = name.rsplit('-', 1)
+        _add(f"{family}:{rest}")
+        _add(f"{family}/{rest}")
+        _add(f"{family}/{rest}:latest")
+        _add(f"{family}:latest")
+
+    # Consult remote registry (best-effort) for additional canonical names
+    try:
+        regs = await search_registry(name, timeout=5.0)
+        for r in regs:
+            _add(r)
+    except Exception:
+        pass
+
+    _CAND_CACHE[name] = (now, candidates)
+    return list(candidates)
 
 
 async def install_model(model: str, timeout: float = 600) -> Dict[str, Any]:
@@ -495,108 +820,52 @@ async def install_model(model: str, timeout: float = 600) -> Dict[str, Any]:
 
     Returns dict {'success': bool, 'output':Str}
     """
-    import asyncio
     if not OLLAMA_USE_CLI:
         # still allow if CLI path exists - best-effort
-        try:
-            import shutil
-            if not shutil.which(OLLAMA_CLI_PATH):
-                return {'success': False, 'output': 'Ollama CLI not installed or OLLAMA_USE_CLI not enabled.'}
-        except Exception:
-            return {'success': False, 'output': 'Ollama CLI check failed.'}
-
-    # Build a prioritized list of candidate names to try for installation.
-    async def _build_candidates(name: str) -> List[str]:
-        # Try a few heuristic canonicalizations and also consult registry search.
-        candidates = []
-        seen = set()
-
-        def _add(n: str):
-            if not n:
-                return
-            if n in seen:
-                return
-            seen.add(n)
-            candidates.append(n)
-
-        # If user provided explicit tag (contains ':'), try it first
-        if ':' in name:
-            _add(name)
-            # also try without tag
-            base = name.split(':', 1)[0]
-            _add(base)
-        else:
-            _add(name)
-            _add(f"{name}:latest")
-
-        # If name looks like 'family-variant' also try 'family:variant' and 'family/variant'
-        if '-' in name and ':' not in name:
-            family, rest = name.rsplit('-', 1)
-            _add(f"{family}:{rest}")
-            _add(f"{family}/{rest}")
-            _add(f"{family}/{rest}:latest")
-            _add(f"{family}:latest")
-
-        # Consult remote registry (best-effort) for additional canonical names
-        try:
-            regs = await search_registry(name, timeout=5.0)
-            for r in regs:
-                _add(r)
-        except Exception:
-            pass
-
-        return candidates
+        if not _cli_path():
+            return {'success': False, 'output': 'Ollama CLI not installed or OLLAMA_USE_CLI not enabled.'}
 
     attempts = await _build_candidates(model)
     attempts_info = []
     # Accumulate HTTP pull outputs and diagnostics when trying multiple endpoints
-    combined_out = []
+    combined_out: List[str] = []
     # Try each candidate until one succeeds
     for candidate in attempts:
         # First, try HTTP-based pull if the Ollama HTTP API is available
         try:
             base = (await _discover_api_url()).rstrip('/')
-            http_candidates = [
-                base + '/api/pull',
-                base + '/v1/pull',
-                base + '/pull',
-                base + '/api/models/pull',
-            ]
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                for url in http_candidates:
-                    try:
-                        resp = await client.post(url, json={'model': candidate})
-                        text = resp.text if resp is not None else ''
-                        combined_out.append(f"HTTP {url} -> {resp.status_code}\n{text}")
-                        if resp is not None and 200 <= resp.status_code < 300:
-                            return {'success': True, 'output': '\n'.join(combined_out), 'attempted': candidate}
-                    except Exception:
-                        # try next HTTP endpoint
-                        continue
+            http_candidates = _pull_urls(base)
+            client = await _get_client()
+            for url in http_candidates:
+                try:
+                    resp = await client.post(url, json={'model': candidate}, timeout=30.0)
+                    text = resp.content.decode('utf-8', 'replace')
+                    combined_out.append(f"HTTP {url} -> {resp.status_code}\n{text}")
+                    if resp is not None and 200 <= resp.status_code < 300:
+                        _PULL_WINNER[base] = url
+                        _invalidate_models_cache()
+                        return {'success': True, 'output': '\n'.join(combined_out), 'attempted': candidate}
+                except Exception:
+                    # try next HTTP endpoint
+                    continue
         except Exception:
             # ignore HTTP discovery errors and fall back to CLI
             pass
 
         cmd = [OLLAMA_CLI_PATH, 'pull', candidate]
         try:
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
             try:
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+                returncode, stdout, stderr = await _run_subprocess(cmd, timeout)
             except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
                 combined_out.append(f"{candidate}: TIMEOUT")
                 continue
 
             out = stdout.decode(errors='ignore') if stdout else ''
             err = stderr.decode(errors='ignore') if stderr else ''
             merged_output = (out or '') + (err or '')
-            attempts_info.append({'name': candidate, 'success': proc.returncode == 0, 'output': merged_output, 'returncode': proc.returncode})
-            if proc.returncode == 0:
+            attempts_info.append({'name': candidate, 'success': returncode == 0, 'output': merged_output, 'returncode': returncode})
+            if returncode == 0:
+                _invalidate_models_cache()
                 return {'success': True, 'output': '\n'.join([a.get('output','') for a in attempts_info]), 'attempted': candidate, 'attempts': attempts_info}
             else:
                 # continue to next candidate
@@ -607,39 +876,29 @@ async def install_model(model: str, timeout: float = 600) -> Dict[str, Any]:
             attempts_info.append({'name': candidate, 'success': False, 'output': f'EXCEPTION: {e}', 'returncode': None})
             continue
 
-        # Nothing succeeded
-        return {'success': False, 'output': '\n'.join([a.get('output','') for a in attempts_info]), 'attempts': attempts_info}
+    # Nothing succeeded
+    output = combined_out + [a.get('output', '') for a in attempts_info]
+    return {'success': False, 'output': '\n'.join(output), 'attempts': attempts_info}
 
 
 async def uninstall_model(model: str, timeout: float = 600) -> Dict[str, Any]:
     """Uninstall a model using Ollama CLI (try rm/remove/uninstall)"""
-    import asyncio
-    try:
-        import shutil
-        if not shutil.which(OLLAMA_CLI_PATH):
-            return {'success': False, 'output': 'Ollama CLI not installed.'}
-    except Exception:
-        return {'success': False, 'output': 'Ollama CLI check failed.'}
+    if not _cli_path():
+        return {'success': False, 'output': 'Ollama CLI not installed.'}
 
     last_err = None
     for cmd in OLLAMA_CLI_UNINSTALL_CMDS:
         try:
-            proc = await asyncio.create_subprocess_exec(
-                OLLAMA_CLI_PATH, cmd, model,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
             try:
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+                returncode, stdout, stderr = await _run_subprocess([OLLAMA_CLI_PATH, cmd, model], timeout)
             except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
                 last_err = 'Timeout waiting for CLI'
                 continue
-            if proc.returncode != 0:
+            if returncode != 0:
                 last_err = stderr.decode(errors='ignore')
                 continue
             out = stdout.decode(errors='ignore')
+            _invalidate_models_cache()
             return {'success': True, 'output': out}
         except FileNotFoundError:
             return {'success': False, 'output': f'Ollama CLI not found at path: {OLLAMA_CLI_PATH}'}
@@ -649,190 +908,168 @@ async def uninstall_model(model: str, timeout: float = 600) -> Dict[str, Any]:
     return {'success': False, 'output': last_err or 'Uninstall failed.'}
 
 
+_CTRL_RE = re.compile(r"[\x00-\x1F\x7F]+")
+# ANSI escape sequences and control characters in a single pass
+_CLEAN_RE = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]|[\x00-\x1F\x7F]+")
+
+
+def _clean_line(raw: str) -> str:
+    """Strip ANSI escapes and control characters from a CLI progress line."""
+    if raw is None:
+        return ''
+    # Remove ANSI escape sequences and control characters in one scan; most
+    # progress lines have no escapes, so those only need the simpler pattern
+    if '\x1b' in raw or '\x9b' in raw:
+        s = _CLEAN_RE.sub('', raw)
+    else:
+        s = _CTRL_RE.sub('', raw)
+    # Trim whitespace
+    s = s.strip()
+    # Filter out lines that are just spinner glyphs or very short non-informative
+    if not s:
+        return ''
+    # Some spinner-only lines contain block unicode like ⠋⠙; if line length small and mostly non-ascii, skip
+    if len(s) <= 3 and all(ord(ch) >= 0x2500 for ch in s):
+        return ''
+    return s
+
+
+# After the CLI exits, how long to keep reading output it left in the pipes.
+_EXIT_DRAIN_TIMEOUT = 1.0
+# Pipe read size; `ollama pull` rewrites progress with bare '\r', so lines are
+# split by hand instead of waiting on readline() for a '\n'.
+_READ_CHUNK = 4096
+_LINE_SPLIT_RE = re.compile(rb"[\r\n]")
+
+
+async def _iter_process_lines(proc: asyncio.subprocess.Process):
+    """Yield stdout/stderr lines of `proc` in arrival order.
+
+    One pending read(`_READ_CHUNK`) task per stream is raced with
+    asyncio.wait and only the stream that produced data is re-armed. Each
+    stream keeps a rolling buffer split on '\r' or '\n', so carriage-return
+    progress updates surface as soon as they arrive. `proc.wait()` runs in
+    the same wait set, so exit is noticed immediately; output still buffered
+    then is drained, bounded by `_EXIT_DRAIN_TIMEOUT` in case a leftover
+    child keeps a pipe open.
+    """
+    readers: Dict[asyncio.Future, asyncio.StreamReader] = {
+        asyncio.ensure_future(st.read(_READ_CHUNK)): st for st in (proc.stdout, proc.stderr) if st is not None
+    }
+    bufs: Dict[asyncio.StreamReader, bytes] = {st: b'' for st in readers.values()}
+    proc_done = asyncio.ensure_future(proc.wait())
+    try:
+        while readers:
+            if proc_done.done():
+                done, _ = await asyncio.wait(readers, timeout=_EXIT_DRAIN_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+            else:
+                done, _ = await asyncio.wait({*readers, proc_done}, return_when=asyncio.FIRST_COMPLETED)
+                done.discard(proc_done)
+            for task in done:
+                st = readers.pop(task)
+                chunk = task.result()
+                if not chunk:
+                    # EOF: hand over a trailing line that had no terminator
+                    tail = bufs.pop(st)
+                    if tail:
+                        yield tail.decode(errors='ignore')
+                    continue
+                readers[asyncio.ensure_future(st.read(_READ_CHUNK))] = st
+                *lines, bufs[st] = _LINE_SPLIT_RE.split(bufs[st] + chunk)
+                for line in lines:
+                    if line:
+                        yield line.decode(errors='ignore')
+        for tail in bufs.values():
+            if tail:
+                yield tail.decode(errors='ignore')
+        await proc_done
+    finally:
+        for task in (*readers, proc_done):
+            task.cancel()
+        if proc.returncode is not None:
+            # A leftover child may still hold a pipe (the drain timeout case);
+            # close the transport so our ends are released, as _run_subprocess does.
+            transport = getattr(proc, '_transport', None)
+            if transport is not None:
+                transport.close()
+
+
 async def install_model_stream(model: str, timeout: float = 600):
     """Async generator that streams install output lines for `ollama pull <model>`.
 
     Yields dict events of shape: {'type': 'line', 'line': str} and a final
     {'type': 'complete', 'success': bool, 'output': str}.
     """
-    import asyncio
-    import re
-
-    _ansi_re = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
-    _ctrl_re = re.compile(r"[\x00-\x1F\x7F]+")
-
-    def _clean_line(raw: str) -> str:
-        if raw is None:
-            return ''
-        # Remove common ANSI escape sequences
-        s = _ansi_re.sub('', raw)
-        # Remove remaining control characters (tabs allowed)
-        s = _ctrl_re.sub('', s)
-        # Trim whitespace
-        s = s.strip()
-        # Filter out lines that are just spinner glyphs or very short non-informative
-        if not s:
-            return ''
-        # Some spinner-only lines contain block unicode like ⠋⠙; if line length small and mostly non-ascii, skip
-        if len(s) <= 3 and all(ord(ch) >= 0x2500 for ch in s):
-            return ''
-        return s
-
-    try:
-        import shutil
-        if not shutil.which(OLLAMA_CLI_PATH):
-            yield {'type': 'line', 'line': f'Ollama CLI not found at: {OLLAMA_CLI_PATH}'}
-            yield {'type': 'complete', 'success': False, 'output': 'CLI not found'}
-            return
-    except Exception:
-        pass
-
-    # Build candidates to try (reuse logic from install_model)
-    async def _build_candidates(name: str) -> List[str]:
-        candidates = []
-        seen = set()
-
-        def _add(n: str):
-            if not n:
-                return
-            if n in seen:
-                return
-            seen.add(n)
-            candidates.append(n)
-
-        if ':' in name:
-            _add(name)
-            _add(name.split(':', 1)[0])
-        else:
-            _add(name)
-            _add(f"{name}:latest")
-
-        if '-' in name and ':' not in name:
-            family, rest = name.rsplit('-', 1)
-            _add(f"{family}:{rest}")
-            _add(f"{family}/{rest}")
-            _add(f"{family}/{rest}:latest")
-            _add(f"{family}:latest")
-
-        try:
-            regs = await search_registry(name, timeout=5.0)
-            for r in regs:
-                _add(r)
-        except Exception:
-            pass
-
-        return candidates
+    if not _cli_path():
+        yield {'type': 'line', 'line': f'Ollama CLI not found at: {OLLAMA_CLI_PATH}'}
+        yield {'type': 'complete', 'success': False, 'output': 'CLI not found'}
+        return
 
     attempts = await _build_candidates(model)
 
-    try:
-        import shutil
-        if not shutil.which(OLLAMA_CLI_PATH):
-            yield {'type': 'line', 'line': f'Ollama CLI not found at: {OLLAMA_CLI_PATH}'}
-            yield {'type': 'complete', 'success': False, 'output': 'CLI not found'}
-            return
-    except Exception:
-        pass
-
     # Try candidates sequentially, streaming output for each
     for candidate in attempts:
         yield {'type': 'attempt_start', 'candidate': candidate}
         # First try HTTP-based pull if API available
         try:
             base = (await _discover_api_url()).rstrip('/')
-            http_candidates = [
-                base + '/api/pull',
-                base + '/v1/pull',
-                base + '/pull',
-                base + '/api/models/pull',
-            ]
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                for url in http_candidates:
-                    try:
-                        resp = await client.post(url, json={'model': candidate})
-                        text = resp.text if resp is not None else ''
-                        # stream the HTTP response text lines if present
-                        if text:
-                            for ln in text.splitlines():
-                                cl = _clean_line(ln)
-                                if cl:
-                                    yield {'type': 'attempt_log', 'candidate': candidate, 'line': cl}
+            http_candidates = _pull_urls(base)
+            client = await _get_client()
+            for url in http_candidates:
+                try:
+                    resp = await client.post(url, json={'model': candidate}, timeout=30.0)
+                    # Decode the body once; the same lines feed the log stream and the error check
+                    text = resp.content.decode('utf-8', 'replace')
+                    has_error = False
+                    for ln in text.splitlines():
+                        cl = _clean_line(ln)
+                        if not cl:
+                            continue
+                        yield {'type': 'attempt_log', 'candidate': candidate, 'line': cl}
                         # Check if response indicates error
-                        has_error = False
-                        if text:
+                        if not has_error and cl.startswith('{'):
                             try:
-                                import json
-                                lines = [l.strip() for l in text.splitlines() if l.strip()]
-                                for line in lines:
-                                    obj = json.loads(line)
-                                    if isinstance(obj, dict) and 'error' in obj:
-                                        has_error = True
-                                        break
-                            except:
-                                pass
-                        success = resp is not None and 200 <= resp.status_code < 300 and not has_error
-                        yield {'type': 'attempt_complete', 'candidate': candidate, 'success': success, 'output': text, 'returncode': resp.status_code}
-                        if success:
-                            yield {'type': 'complete', 'success': True, 'output': text, 'attempted': candidate}
-                            return
-                    except Exception:
-                        continue
+                                obj = _loads(cl)
+                            except ValueError:
+                                continue
+                            has_error = isinstance(obj, dict) and 'error' in obj
+                    success = resp is not None and 200 <= resp.status_code < 300 and not has_error
+                    yield {'type': 'attempt_complete', 'candidate': candidate, 'success': success, 'output': text, 'returncode': resp.status_code}
+                    if success:
+                        _PULL_WINNER[base] = url
+                        _invalidate_models_cache()
+                        yield {'type': 'complete', 'success': True, 'output': text, 'attempted': candidate}
+                        return
+                except Exception:
+                    continue
         except Exception:
             pass
 
         cmd = [OLLAMA_CLI_PATH, 'pull', candidate]
         try:
+            # The stock asyncio loop blocks briefly inside Popen while spawning;
+            # uvloop (pulled in by uvicorn[standard], used automatically) does not.
             proc = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
             )
 
-            stdout = proc.stdout
-            stderr = proc.stderr
-
-            # Continuously read until process exits
-            while True:
-                read = False
-                if stdout is not None:
-                    try:
-                        line = await asyncio.wait_for(stdout.readline(), timeout=0.1)
-                        if line:
-                            read = True
-                            raw = line.decode(errors='ignore')
-                            cleaned = _clean_line(raw)
-                            if cleaned:
-                                yield {'type': 'attempt_log', 'candidate': candidate, 'line': cleaned}
-                    except asyncio.TimeoutError:
-                        pass
-                if stderr is not None:
-                    try:
-                        line2 = await asyncio.wait_for(stderr.readline(), timeout=0.1)
-                        if line2:
-                            read = True
-                            raw2 = line2.decode(errors='ignore')
-                            cleaned2 = _clean_line(raw2)
-                            if cleaned2:
-                                yield {'type': 'attempt_log', 'candidate': candidate, 'line': cleaned2}
-                    except asyncio.TimeoutError:
-                        pass
-                if not read:
-                    if proc.returncode is None:
-                        await asyncio.sleep(0.05)
-                        continue
-                    break
-
-            try:
-                out, err = await asyncio.wait_for(proc.communicate(), timeout=5)
-            except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
-                out, err = b'', b''
+            # Lines arrive as soon as the CLI writes them; the last one usually
+            # carries the outcome ("success" or the error message).
+            output = ''
+            async for raw in _iter_process_lines(proc):
+                cleaned = _clean_line(raw)
+                if cleaned:
+                    output = cleaned
+                    yield {'type': 'attempt_log', 'candidate': candidate, 'line': cleaned}
 
             success = (proc.returncode == 0)
-            output = (out.decode(errors='ignore') if out else '') + (err.decode(errors='ignore') if err else '')
             yield {'type': 'attempt_complete', 'candidate': candidate, 'success': success, 'output': output, 'returncode': (proc.returncode if proc.returncode is not None else -1)}
             if success:
+                _invalidate_models_cache()
                 yield {'type': 'complete', 'success': True, 'output': output, 'attempted': candidate}
                 return
             else:
@@ -854,71 +1091,21 @@ async def install_model_stream(model: str, timeout: float = 600):
 
 async def uninstall_model_stream(model: str, timeout: float = 600):
     """Streamed uninstall `ollama rm <model>` output like install_model_stream"""
-    import asyncio
-    import re
-
-    _ansi_re = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
-    _ctrl_re = re.compile(r"[\x00-\x1F\x7F]+")
-
-    def _clean_line(raw: str) -> str:
-        if raw is None:
-            return ''
-        s = _ansi_re.sub('', raw)
-        s = _ctrl_re.sub('', s)
-        s = s.strip()
-        if not s:
-            return ''
-        return s
-
     try:
         proc = await asyncio.create_subprocess_exec(
             OLLAMA_CLI_PATH, 'rm', model,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
-        stdout = proc.stdout
-        stderr = proc.stderr
-
-        while True:
-            read = False
-            if stdout is not None:
-                try:
-                    line = await asyncio.wait_for(stdout.readline(), timeout=0.1)
-                    if line:
-                        read = True
-                        cleaned = _clean_line(line.decode(errors='ignore'))
-                        if cleaned:
-                            yield {'type': 'line', 'line': cleaned}
-                except asyncio.TimeoutError:
-                    pass
-            if stderr is not None:
-                try:
-                    line2 = await asyncio.wait_for(stderr.readline(), timeout=0.1)
-                    if line2:
-                        read = True
-                        cleaned2 = _clean_line(line2.decode(errors='ignore'))
-                        if cleaned2:
-                            yield {'type': 'line', 'line': cleaned2}
-                except asyncio.TimeoutError:
-                    pass
-            if not read:
-                if proc.returncode is None:
-                    await asyncio.sleep(0.05)
-                    # poll
-                    await asyncio.sleep(0.05)
-                    if proc.returncode is None:
-                        continue
-                break
-
-        try:
-            out, err = await asyncio.wait_for(proc.communicate(), timeout=5)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            out, err = b'', b''
+        output = ''
+        async for raw in _iter_process_lines(proc):
+            cleaned = _clean_line(raw)
+            if cleaned:
+                output = cleaned
+                yield {'type': 'line', 'line': cleaned}
 
         success = proc.returncode == 0
-        output = (out.decode(errors='ignore') if out else '') + (err.decode(errors='ignore') if err else '')
+        _invalidate_models_cache()
         yield {'type': 'complete', 'success': success, 'output': output}
     except FileNotFoundError:
         yield {'type': 'line', 'line': f'Ollama CLI not found at path: {OLLAMA_CLI_PATH}'}
@@ -928,120 +1115,132 @@ async def uninstall_model_stream(model: str, timeout: float = 600):
         yield {'type': 'complete', 'success': False, 'output': str(e)}
 
 
+# Installed-model lists per API base: base -> (fetched_at, models). Cleared on install/uninstall.
+_MODELS_CACHE: Dict[str, tuple[float, List[str]]] = {}
+_MODELS_TTL = 30.0
+
+
+def _invalidate_models_cache():
+    """Forget cached model lists (the installed set just changed)."""
+    _MODELS_CACHE.clear()
+
+
+def _first_column(out: str) -> List[str]:
+    """Model names from CLI table output: the first field of each line, deduped in order.
+
+    A header row ('NAME  ID  SIZE ...') can only be the first line, so only
+    that line is checked for it.
+    """
+    names = []
+    header_checked = False
+    for line in out.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # columns are padded with tabs or spaces; maxsplit=1 avoids splitting the whole line
+        name = line.split(None, 1)[0]
+        if not header_checked:
+            header_checked = True
+            if name.upper() in ('NAME', 'MODEL', 'MODELS'):
+                continue
+        names.append(name)
+    return list(dict.fromkeys(names))
+
+
 async def list_models(timeout: float = 10.0) -> List[str]:
     """Return a list of available model names from local Ollama.
 
-    Tries the HTTP API first, then falls back to the CLI.
+    Tries the HTTP API first, then falls back to the CLI. Non-empty results
+    are reused for `_MODELS_TTL` seconds.
     """
-    # Try HTTP API endpoints that Ollama may expose
     base = (await _discover_api_url()).rstrip('/')
+    cached = _MODELS_CACHE.get(base)
+    if cached is not None and time.monotonic() - cached[0] < _MODELS_TTL:
+        return list(cached[1])
+    models = await _list_models_once(base, timeout)
+    if models:
+        _MODELS_CACHE[base] = (time.monotonic(), models)
+    return list(models)
+
+
+def _parse_model_list(data: Any) -> List[str]:
+    """Model names from a models-endpoint reply, deduped in order."""
+    # data might be a list of names or list of dicts
+    models = []
+    if isinstance(data, dict):
+        # sometimes models listed under 'models' key
+        data = data.get('models') or data.get('data')
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, str):
+                models.append(item)
+            elif isinstance(item, dict):
+                # common keys: 'name', 'model', 'id'
+                name = item.get('name') or item.get('model') or item.get('id')
+                if name:
+                    models.append(name)
+    return list(dict.fromkeys(models))
+
+
+async def _list_models_once(base: str, timeout: float) -> List[str]:
+    global _CLI_LIST_WINNER
+    # Try HTTP API endpoints that Ollama may expose
     candidates = [
         base + '/api/models',
         base + '/models',
         base + '/v1/models',
     ]
 
+    # Probe all candidates at once so a dead server costs one timeout, not three;
+    # the first one that lists models wins and the rest are cancelled.
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for url in candidates:
+        client = await _get_client()
+        tasks = [asyncio.create_task(client.get(url, timeout=timeout)) for url in candidates]
+        try:
+            for fut in asyncio.as_completed(tasks):
                 try:
-                    resp = await client.get(url)
+                    resp = await fut
                     if resp.status_code != 200:
                         continue
-                    data = resp.json()
-                    # data might be a list of names or list of dicts
-                    models = []
-                    if isinstance(data, list):
-                        for item in data:
-                            if isinstance(item, str):
-                                models.append(item)
-                            elif isinstance(item, dict):
-                                # common keys: 'name', 'model', 'id'
-                                name = item.get('name') or item.get('model') or item.get('id')
-                                if name:
-                                    models.append(name)
-                    elif isinstance(data, dict):
-                        # sometimes models listed under 'models' key
-                        m = data.get('models') or data.get('data')
-                        if isinstance(m, list):
-                            for item in m:
-                                if isinstance(item, str):
-                                    models.append(item)
-                                elif isinstance(item, dict):
-                                    n = item.get('name') or item.get('model') or item.get('id')
-                                    if n:
-                                        models.append(n)
-
-                    if models:
-                        # dedupe and return
-                        seen = []
-                        for x in models:
-                            if x not in seen:
-                                seen.append(x)
-                        return seen
+                    models = _parse_model_list(_loads(resp.content))
                 except Exception:
                     continue
+                if models:
+                    return models
+        finally:
+            for task in tasks:
+                task.cancel()
     except Exception:
         pass
 
-    # Fallback: try CLI 'ollama list' or 'ollama ls' and parse output
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            OLLAMA_CLI_PATH, 'list',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            return []
+    # Fallback: try CLI 'ollama list' or 'ollama ls' and parse output.
+    # Skip the fork/exec entirely when the binary is not on PATH.
+    if not _cli_path():
+        return []
 
-        if proc.returncode != 0:
-            # try 'ollama ls'
-            proc2 = await asyncio.create_subprocess_exec(
-                OLLAMA_CLI_PATH, 'ls',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+    try:
+        subcmds = [_CLI_LIST_WINNER] if _CLI_LIST_WINNER else OLLAMA_CLI_LIST_CMDS
+        out = None
+        for subcmd in subcmds:
             try:
-                stdout2, stderr2 = await asyncio.wait_for(proc2.communicate(), timeout=timeout)
+                returncode, stdout, stderr = await _run_subprocess([OLLAMA_CLI_PATH, subcmd], timeout)
             except asyncio.TimeoutError:
-                proc2.kill()
-                await proc2.wait()
-                return []
-            if proc2.returncode != 0:
                 return []
-            out = stdout2.decode(errors='ignore')
-        else:
-            out = stdout.decode(errors='ignore')
+            if returncode == 0:
+                _CLI_LIST_WINNER = subcmd
+                out = stdout.decode(errors='ignore')
+                break
+        if out is None:
+            # a remembered subcommand stopped working: probe again next time
+            _CLI_LIST_WINNER = None
+            return []
 
-        models = []
-        for line in out.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            # crude parsing: assume first token is model name
-            parts = line.split()
-            if parts:
-                name = parts[0]
-                # skip headers like 'MODEL' or lines starting with '-'
-                if name.lower() in ('model', 'models', 'name'):
-                    continue
-                models.append(name)
-
-        # dedupe
-        seen = []
-        for x in models:
-            if x not in seen:
-                seen.append(x)
-        return seen
+        return _first_column(out)
     except FileNotFoundError:
         # CLI not installed
         return []
     except Exception as e:
-        print(f"Error listing ollama models: {e}")
+        logger.error("Error listing ollama models: %s", e)
         return []
 
 
@@ -1052,55 +1251,25 @@ async def search_registry(query: str, timeout: float = 10.0) -> List[str]:
     """
     try:
         # If CLI exists, try 'ollama search' or 'ollama ls-remote' depending on version
-        proc = await asyncio.create_subprocess_exec(
-            OLLAMA_CLI_PATH, 'search', query,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            returncode, stdout, stderr = await _run_subprocess([OLLAMA_CLI_PATH, 'search', query], timeout)
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             return []
 
-        if proc.returncode != 0:
+        if returncode != 0:
             # If 'search' is not supported, try 'ls-remote' if available
-            proc2 = await asyncio.create_subprocess_exec(
-                OLLAMA_CLI_PATH, 'ls-remote', query,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
             try:
-                stdout2, stderr2 = await asyncio.wait_for(proc2.communicate(), timeout=timeout)
+                _, stdout2, stderr2 = await _run_subprocess([OLLAMA_CLI_PATH, 'ls-remote', query], timeout)
             except asyncio.TimeoutError:
-                proc2.kill()
-                await proc2.wait()
                 return []
             out = stdout2.decode(errors='ignore')
         else:
             out = stdout.decode(errors='ignore')
 
-        names = []
-        for line in out.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            # output may be 'NAME (ID) SIZE' or 'model-name:tag'
-            parts = line.split()
-            # prefer tokens that contain ':' or '-'
-            candidate = parts[0]
-            names.append(candidate)
-        # dedupe
-        seen = []
-        res = []
-        for n in names:
-            if n not in seen:
-                seen.append(n)
-                res.append(n)
-        return res
+        # output may be 'NAME (ID) SIZE' or 'model-name:tag'
+        return _first_column(out)
     except FileNotFoundError:
         return []
     except Exception as e:
-        print(f"Error performing registry search: {e}")
+        logger.error("Error performing registry search: %s", e)
         return []
@@ -1,17 +1,62 @@
 """OpenRouter API client for making LLM requests."""
 
+import asyncio
+import functools
+import time
+
 import httpx
 from typing import List, Dict, Any, Optional
 
+from .config import OPENROUTER_MAX_PARALLEL, http2_available
+from .http_pool import LazySemaphore, PooledClient
 
-def _get_api_config():
-    """Get OpenRouter API configuration dynamically."""
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+# TLS connections to OpenRouter and custom OpenAI-compatible APIs; reusing
+# them saves a handshake per council member on every stage.
+_HTTP = PooledClient(lambda: httpx.AsyncClient(
+    http2=http2_available(),
+    limits=_HTTP_LIMITS,
+    timeout=120.0,
+))
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """The pooled client for completions, key validation and model listing."""
+    return _HTTP.get()
+
+
+async def aclose():
+    """Close the OpenRouter HTTP client (call from application shutdown)."""
+    await _HTTP.aclose()
+
+
+# Model lists per (models URL, API key): key -> (fetched_at, models).
+_MODELS_CACHE: Dict[tuple, tuple[float, List[str]]] = {}
+_MODELS_TTL = 30.0
+
+
+def _cached_models(key: tuple) -> Optional[List[str]]:
+    """Return a still-fresh cached model list for `key`, if any."""
+    hit = _MODELS_CACHE.get(key)
+    if hit is not None and time.monotonic() - hit[0] < _MODELS_TTL:
+        return list(hit[1])
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _api_config_for_version(version: int):
     from . import config_store
     api_key = config_store.get_openrouter_api_key()
     api_url = config_store.get_openrouter_api_url()
     return api_key, api_url
 
 
+def _get_api_config():
+    """Get OpenRouter API configuration, re-read only after the config changes."""
+    from . import config_store
+    return _api_config_for_version(config_store.version())
+
+
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
@@ -29,7 +74,17 @@ async def query_model(
         Response dict with 'content' and optional 'reasoning_details', or None if failed
     """
     api_key, api_url = _get_api_config()
-    
+    return await _query_model_with_config(model, messages, api_key, api_url, timeout)
+
+
+async def _query_model_with_config(
+    model: str,
+    messages: List[Dict[str, str]],
+    api_key: str,
+    api_url: str,
+    timeout: float = 120.0
+) -> Optional[Dict[str, Any]]:
+    """Query a single model with an already-resolved API key and URL."""
     if not api_key:
         print("Error: OpenRouter API key not configured")
         return None
@@ -45,21 +100,22 @@ async def query_model(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                api_url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            message = data['choices'][0]['message']
-
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
+        client = await _get_client()
+        response = await client.post(
+            api_url,
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+
+        data = response.json()
+        message = data['choices'][0]['message']
+
+        return {
+            'content': message.get('content'),
+            'reasoning_details': message.get('reasoning_details')
+        }
 
     except Exception as e:
         print(f"Error querying model {model}: {e}")
@@ -87,14 +143,20 @@ async def list_models(timeout: float = 30.0) -> List[str]:
         "Content-Type": "application/json",
     }
     
+    cache_key = (models_url, api_key)
+    cached = _cached_models(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(models_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # OpenRouter returns { "data": [ { "id": "model-id", ... }, ... ] }
-            models = [m.get('id') for m in data.get('data', []) if m.get('id')]
-            return sorted(models)
+        client = await _get_client()
+        response = await client.get(models_url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        # OpenRouter returns { "data": [ { "id": "model-id", ... }, ... ] }
+        models = sorted(dict.fromkeys(m.get('id') for m in data.get('data', []) if m.get('id')))
+        _MODELS_CACHE[cache_key] = (time.monotonic(), models)
+        return list(models)
     except Exception as e:
         print(f"Error fetching OpenRouter models: {e}")
         return []
@@ -121,16 +183,20 @@ async def validate_api_key(api_key: str, api_url: str = None, timeout: float = 1
     }
     
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(models_url, headers=headers)
-            if response.status_code == 401:
-                return {'valid': False, 'message': 'Invalid API key (401 Unauthorized)'}
-            if response.status_code == 403:
-                return {'valid': False, 'message': 'API key forbidden (403)'}
-            response.raise_for_status()
-            data = response.json()
-            model_count = len(data.get('data', []))
-            return {'valid': True, 'message': f'API key valid. {model_count} models available.'}
+        client = await _get_client()
+        # Only the status code matters, so don't download the model list
+        response = await client.head(models_url, headers=headers, timeout=timeout)
+        if response.status_code in (404, 405, 501):
+            # No HEAD route; a streamed GET yields the status once the headers
+            # arrive, and leaving the block closes it without reading the body
+            async with client.stream('GET', models_url, headers=headers, timeout=timeout) as response:
+                pass
+        if response.status_code == 401:
+            return {'valid': False, 'message': 'Invalid API key (401 Unauthorized)'}
+        if response.status_code == 403:
+            return {'valid': False, 'message': 'API key forbidden (403)'}
+        response.raise_for_status()
+        return {'valid': True, 'message': 'API key valid.'}
     except httpx.TimeoutException:
         return {'valid': False, 'message': 'Connection timed out'}
     except httpx.ConnectError as e:
@@ -163,35 +229,35 @@ async def list_models_from_url(api_url: str, api_key: str = None, timeout: float
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
+
+    cache_key = (models_url, api_key)
+    cached = _cached_models(cache_key)
+    if cached is not None:
+        return cached
     
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(models_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        client = await _get_client()
+        response = await client.get(models_url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
             
-            # Handle different API response formats
-            models = []
-            if isinstance(data, dict):
-                # OpenAI format: { "data": [ { "id": "model-id" }, ... ] }
-                model_list = data.get('data', []) or data.get('models', [])
-                for m in model_list:
-                    if isinstance(m, str):
-                        models.append(m)
-                    elif isinstance(m, dict):
-                        model_id = m.get('id') or m.get('name') or m.get('model')
-                        if model_id:
-                            models.append(model_id)
-            elif isinstance(data, list):
-                for m in data:
-                    if isinstance(m, str):
-                        models.append(m)
-                    elif isinstance(m, dict):
-                        model_id = m.get('id') or m.get('name') or m.get('model')
-                        if model_id:
-                            models.append(model_id)
-            
-            return sorted(models)
+        # Handle different API response formats
+        # OpenAI format: { "data": [ { "id": "model-id" }, ... ] }; some servers return a bare list
+        model_list = (data.get('data', []) or data.get('models', [])) if isinstance(data, dict) else data
+        models = []
+        if isinstance(model_list, list):
+            for m in model_list:
+                if isinstance(m, str):
+                    models.append(m)
+                elif isinstance(m, dict):
+                    model_id = m.get('id') or m.get('name') or m.get('model')
+                    if model_id:
+                        models.append(model_id)
+
+        # dedupe in O(n) before sorting
+        models = sorted(dict.fromkeys(models))
+        _MODELS_CACHE[cache_key] = (time.monotonic(), models)
+        return list(models)
     except Exception as e:
         print(f"Error fetching models from {models_url}: {e}")
         return []
@@ -227,27 +293,32 @@ async def query_custom_api(
     }
     
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                api_url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
+        client = await _get_client()
+        response = await client.post(
+            api_url,
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        )
+        response.raise_for_status()
             
-            data = response.json()
-            message = data['choices'][0]['message']
+        data = response.json()
+        message = data['choices'][0]['message']
             
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
+        return {
+            'content': message.get('content'),
+            'reasoning_details': message.get('reasoning_details')
+        }
     
     except Exception as e:
         print(f"Error querying custom API {model}: {e}")
         return None
 
 
+# Completions in flight to OpenRouter, so large councils stay under its rate limits.
+_QUERY_SLOTS = LazySemaphore(OPENROUTER_MAX_PARALLEL)
+
+
 async def query_models_parallel(
     models: List[str],
     messages: List[Dict[str, str]]
@@ -262,13 +333,54 @@ async def query_models_parallel(
     Returns:
         Dict mapping model identifier to response dict (or None if failed)
     """
-    import asyncio
+    # Resolve the config once for the whole fan-out
+    api_key, api_url = _get_api_config()
 
-    # Create tasks for all models
-    tasks = [query_model(model, messages) for model in models]
+    # Cap requests in flight so large councils don't trip rate limits or
+    # stampede the pool with simultaneous TLS handshakes
+    async def _run(model: str):
+        async with _QUERY_SLOTS:
+            return await _query_model_with_config(model, messages, api_key, api_url)
 
-    # Wait for all to complete
-    responses = await asyncio.gather(*tasks)
+    # Wait for all to complete; a rate-limited or failing model maps to None
+    responses = await asyncio.gather(*(_run(model) for model in models), return_exceptions=True)
 
     # Map models to their responses
-    return {model: response for model, response in zip(models, responses)}
+    return {
+        model: (None if isinstance(response, BaseException) else response)
+        for model, response in zip(models, responses)
+    }
+
+
+async def query_models_parallel_iter(
+    models: List[str],
+    messages: List[Dict[str, str]]
+):
+    """
+    Query multiple models in parallel, yielding results as they finish.
+
+    Args:
+        models: List of OpenRouter model identifiers
+        messages: List of message dicts to send to each model
+
+    Yields:
+        (model, response) tuples in completion order; response is None if failed
+    """
+    api_key, api_url = _get_api_config()
+
+    async def _run(model: str):
+        async with _QUERY_SLOTS:
+            try:
+                return model, await _query_model_with_config(model, messages, api_key, api_url)
+            except Exception as e:
+                print(f"Error querying model {model}: {e}")
+                return model, None
+
+    tasks = [asyncio.create_task(_run(model)) for model in models]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        # consumer stopped early: don't leave queries running
+        for task in tasks:
+            task.cancel()
@@ -2,20 +2,199 @@
 
 This module stores conversations as individual JSON files under `DATA_DIR`.
 It includes defensive handling for malformed or non-conversation files
-that may be present in the directory (e.g. `config.json`).
+that may be present in the directory. Internal files (`_config.json`,
+`_index.json`) start with '_', which conversation ids never do.
+
+Listing metadata (id, title, created_at, message_count) is kept in an
+`_index.json` sidecar so the sidebar doesn't have to parse every
+conversation; it is rebuilt from a directory scan when missing or stale.
+
+Saves made while the event loop is running are coalesced: the conversation
+is marked dirty and written out at most every `_FLUSH_DELAY` seconds, so a
+burst of updates to one conversation costs a single write. The event loop
+only serializes; a single writer thread does the file I/O and fsyncs. Call
+`flush()` to force pending writes to disk (done on application shutdown
+and, as a fallback, at interpreter exit).
+
+When the only pending change to a conversation is new messages, they are
+appended to a `<id>.jsonl` log next to the `<id>.json` snapshot instead of
+rewriting the whole file. Any other change, or a log grown as large as the
+snapshot, rewrites the snapshot and drops the log. Log records carry the
+generation tag stored in the snapshot they extend, so a log left behind by a
+crash during a rewrite is ignored rather than replayed onto the new snapshot.
+
+With `STORAGE_ZSTD_LEVEL` set, snapshots are written zstd-compressed under
+the same `<id>.json` name. Reads recognize the zstd frame header, so plain
+and compressed files can coexist and older files are compressed as they
+are next rewritten.
 """
 
+import asyncio
+import atexit
+import collections
+import functools
+import hashlib
+import heapq
 import json
+import logging
+import operator
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Callable
 from pathlib import Path
-from .config import DATA_DIR
+from .config import DATA_DIR, DEBUG_PRETTY_JSON, STORAGE_ZSTD_LEVEL
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DUMP_OPTION = orjson.OPT_INDENT_2 if DEBUG_PRETTY_JSON else None
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_DUMP_OPTION)
+
+    _dumps_line = orjson.dumps
+except ImportError:  # optional: orjson (de)serializes long message histories several times faster
+    _loads = json.loads
+    _DUMP_KWARGS = {'indent': 2} if DEBUG_PRETTY_JSON else {'separators': (',', ':')}
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, **_DUMP_KWARGS).encode()
+
+    def _dumps_line(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed to write or read compressed conversation files
+    zstandard = None
+
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_ZSTD_COMPRESSOR = (
+    zstandard.ZstdCompressor(level=STORAGE_ZSTD_LEVEL)
+    if zstandard is not None and STORAGE_ZSTD_LEVEL > 0 else None
+)
+if STORAGE_ZSTD_LEVEL > 0 and zstandard is None:
+    logger.warning("STORAGE_ZSTD_LEVEL=%s but the zstandard package is not installed; "
+                   "conversation files will be written uncompressed", STORAGE_ZSTD_LEVEL)
+# zstd contexts aren't thread-safe and files are parsed on a thread pool
+_ZSTD_LOCAL = threading.local()
+
+
+def _compress(data: bytes) -> bytes:
+    return _ZSTD_COMPRESSOR.compress(data) if _ZSTD_COMPRESSOR is not None else data
+
+
+def _decompress(raw: bytes) -> bytes:
+    """Undo `_compress`; bytes that aren't a zstd frame are returned as-is."""
+    if not raw.startswith(_ZSTD_MAGIC):
+        return raw
+    if zstandard is None:
+        raise ValueError("file is zstd-compressed but the zstandard package is not installed")
+    dctx = getattr(_ZSTD_LOCAL, 'dctx', None)
+    if dctx is None:
+        dctx = _ZSTD_LOCAL.dctx = zstandard.ZstdDecompressor()
+    return dctx.decompress(raw)
+
+
+def _read_json(path: str) -> Any:
+    """Read and parse a (possibly compressed) JSON file in one pass."""
+    with open(path, 'rb') as f:
+        return _loads(_decompress(f.read()))
+
+
+# fdatasync skips flushing metadata such as mtime; not every platform has it.
+_datasync = getattr(os, 'fdatasync', os.fsync)
+# Created with 0666 so the kernel applies the umask, as open() would (mkstemp forces 0600).
+_FILE_MODE = 0o666
+_TMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0)
+
+
+def _create_temp(directory: str) -> tuple[int, str]:
+    """Create a unique `.tmp_` file in `directory`: (fd, path)."""
+    while True:
+        tmp = os.path.join(directory, f'.tmp_{os.urandom(8).hex()}')
+        try:
+            return os.open(tmp, _TMP_FLAGS, _FILE_MODE), tmp
+        except FileExistsError:
+            continue
+
+
+def _atomic_write(path: str, data: bytes):
+    """Replace `path` with `data` so a crash leaves either the old file or the new one.
+
+    The bytes go to a unique temp file in the same directory in a single
+    write and are synced before `os.replace`.
+    """
+    directory = os.path.dirname(path)
+    try:
+        fd, tmp = _create_temp(directory)
+    except FileNotFoundError:
+        # the directory was removed while running; recreate it and retry once
+        _forget_data_dir()
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        fd, tmp = _create_temp(directory)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            _datasync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _write_json(path: str, obj: Any):
+    """Serialize `obj` and atomically replace `path` with it."""
+    _atomic_write(path, _dumps(obj))
+
+
+INDEX_FILENAME = '_index.json'
+# Internal files from before the '_' prefix convention; config_store migrates
+# its file on first read and the old index is dropped by the next rebuild.
+_LEGACY_INTERNAL_FILES = {'config.json', 'conversation_index.json'}
+
+
+def _is_conversation_file(name: str) -> bool:
+    return name.endswith('.json') and not name.startswith('_') and name not in _LEGACY_INTERNAL_FILES
+
+
+def _utcnow_iso() -> str:
+    """Current UTC time in the naive ISO format stored in conversation files.
+
+    Replaces `datetime.utcnow()`, which is deprecated since Python 3.12.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+# DATA_DIR as of the last successful `ensure_data_dir`, so repeat calls skip the mkdir.
+_DATA_DIR_READY: Optional[str] = None
 
 
 def ensure_data_dir():
-    """Ensure the data directory exists."""
+    """Ensure the data directory exists (checked once per process)."""
+    global _DATA_DIR_READY
+    if _DATA_DIR_READY == DATA_DIR:
+        return
     Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
+    _DATA_DIR_READY = DATA_DIR
+
+
+def _forget_data_dir():
+    """Make the next `ensure_data_dir` check again (the directory went missing)."""
+    global _DATA_DIR_READY
+    _DATA_DIR_READY = None
 
 
 def get_conversation_path(conversation_id: str) -> str:
@@ -23,135 +202,863 @@ def get_conversation_path(conversation_id: str) -> str:
     return os.path.join(DATA_DIR, f"{conversation_id}.json")
 
 
+def _log_path(path: str) -> str:
+    """Append log belonging to the conversation snapshot at `path`."""
+    return path[:-len('.json')] + '.jsonl'
+
+
 def create_conversation(conversation_id: str) -> Dict[str, Any]:
     """Create and persist a new conversation."""
     ensure_data_dir()
     conversation = {
         "id": conversation_id,
-        "created_at": datetime.utcnow().isoformat(),
+        "created_at": _utcnow_iso(),
         "title": "New Conversation",
-        "messages": []
+        "messages": [],
+        "message_count": 0
     }
     path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    gen = _new_log_gen()
+    data = _dumps({**conversation, _LOG_GEN_KEY: gen})
+    _write_snapshot(path, conversation_id, data, _digest(data))
+    _LOG_GEN[conversation_id] = gen
+    _remember(conversation, path)
+    _update_index(conversation)
     return conversation
 
 
+# Parsed conversations by id: id -> (`_convo_sig` of the files when loaded/written, conversation).
+# A hit skips re-reading and re-parsing the file; any outside change to the file invalidates it.
+# Least recently used entries are dropped beyond `_CONVO_CACHE_MAX`.
+_CONVO_CACHE: "collections.OrderedDict[str, tuple[tuple[int, ...], Dict[str, Any]]]" = collections.OrderedDict()
+_CONVO_CACHE_MAX = 128
+
+
+def _file_sig(st: os.stat_result) -> tuple[int, int]:
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _convo_sig(path: str) -> tuple[int, ...]:
+    """(mtime_ns, size) of a snapshot, plus those of its append log if one exists.
+
+    Raises OSError if the snapshot itself is missing.
+    """
+    sig = _file_sig(os.stat(path))
+    try:
+        return sig + _file_sig(os.stat(_log_path(path)))
+    except FileNotFoundError:
+        return sig
+
+
+def _cache_put(conversation_id: str, sig: tuple[int, ...], conversation: Dict[str, Any]):
+    _CONVO_CACHE[conversation_id] = (sig, conversation)
+    _CONVO_CACHE.move_to_end(conversation_id)
+    if len(_CONVO_CACHE) > _CONVO_CACHE_MAX:
+        _CONVO_CACHE.popitem(last=False)
+
+
+def _remember(conversation: Dict[str, Any], path: str):
+    """Cache `conversation` against the file just written for it."""
+    try:
+        _cache_put(conversation['id'], _convo_sig(path), conversation)
+    except OSError:
+        _CONVO_CACHE.pop(conversation['id'], None)
+
+
 def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     """Load a conversation, or return None if not found or invalid.
 
-    Internal files such as `config.json` are ignored.
+    Internal files such as the config and the index are ignored. The
+    returned dict is shared with the in-memory cache; callers that modify it
+    are expected to hand it back to `save_conversation`.
     """
+    pending = _DIRTY.get(conversation_id) or _INFLIGHT.get(conversation_id)
+    if pending is not None:
+        # saved but not written yet
+        return pending
     path = get_conversation_path(conversation_id)
-    if os.path.basename(path) == 'config.json':
+    if not _is_conversation_file(os.path.basename(path)):
         return None
-    if not os.path.exists(path):
+    try:
+        sig = _convo_sig(path)
+    except OSError:
+        _CONVO_CACHE.pop(conversation_id, None)
+        return None
+    cached = _CONVO_CACHE.get(conversation_id)
+    if cached is not None and cached[0] == sig:
+        _CONVO_CACHE.move_to_end(conversation_id)
+        return cached[1]
+    loaded = _load_conversation_file(path)
+    if loaded is None:
         return None
+    _cache_put(conversation_id, *loaded)
+    return loaded[1]
+
+
+async def aget_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Async variant of `get_conversation` for request handlers.
+
+    Cache hits are served inline; on a miss the file is read and parsed in a
+    worker thread so the event loop keeps serving other requests.
+    """
+    pending = _DIRTY.get(conversation_id) or _INFLIGHT.get(conversation_id)
+    if pending is not None:
+        return pending
+    path = get_conversation_path(conversation_id)
+    if not _is_conversation_file(os.path.basename(path)):
+        return None
+    cached = _CONVO_CACHE.get(conversation_id)
+    if cached is not None:
+        try:
+            sig = _convo_sig(path)
+        except OSError:
+            _CONVO_CACHE.pop(conversation_id, None)
+            return None
+        if cached[0] == sig:
+            _CONVO_CACHE.move_to_end(conversation_id)
+            return cached[1]
+    loaded = await asyncio.to_thread(_load_conversation_file, path)
+    # Saves or loads that landed while the file was being read win
+    pending = _DIRTY.get(conversation_id) or _INFLIGHT.get(conversation_id)
+    if pending is not None:
+        return pending
+    current = _CONVO_CACHE.get(conversation_id)
+    if current is not None and current is not cached:
+        return current[1]
+    if loaded is None:
+        _CONVO_CACHE.pop(conversation_id, None)
+        return None
+    _cache_put(conversation_id, *loaded)
+    return loaded[1]
+
+
+def _load_conversation_file(path: str) -> Optional[tuple[tuple[int, ...], Dict[str, Any]]]:
+    """Read a conversation and its append log: (`_convo_sig`, conversation).
+
+    Returns None if the file is missing or not a conversation. Touches no
+    module state, so it is safe to run in a worker thread.
+    """
     try:
-        with open(path, 'r') as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-            else:
-                return None
+        sig = _convo_sig(path)
+        data = _read_json(path)
+        if not isinstance(data, dict):
+            return None
+        gen = data.pop(_LOG_GEN_KEY, None)
+        if len(sig) > 2:
+            _replay_log(data, _log_path(path), gen)
     except Exception:
         return None
+    return sig, data
 
 
-def save_conversation(conversation: Dict[str, Any]):
-    """Persist a conversation dictionary to disk."""
-    ensure_data_dir()
-    path = get_conversation_path(conversation['id'])
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+# Snapshot field holding its generation tag; log records carry it as 'g'.
+_LOG_GEN_KEY = '_log_gen'
+# Generation tag of each conversation's snapshot as last written by this process.
+# Appends need it; a conversation without one gets a full rewrite instead.
+_LOG_GEN: Dict[str, str] = {}
+
 
+def _new_log_gen() -> str:
+    return os.urandom(4).hex()
 
-def list_conversations() -> List[Dict[str, Any]]:
-    """Return metadata for all stored conversations.
 
-    Skips `config.json` and any non-JSON or malformed files. Attempts to
-    recover simple list-formatted files by treating the list as messages.
+def _replay_log(conversation: Dict[str, Any], log_path: str, gen: Optional[str]):
+    """Apply the messages recorded in an append log to a loaded snapshot.
+
+    Only records tagged with the snapshot's generation `gen` belong to it; a
+    log that outlived a crashed rewrite is ignored. Each record also carries
+    the position its message was appended at, so records already folded into
+    the snapshot are skipped and a torn last line left by a crash is ignored.
+    Snapshots and logs written before generation tags both have none and
+    still match.
     """
-    ensure_data_dir()
-    conversations: List[Dict[str, Any]] = []
-    for filename in os.listdir(DATA_DIR):
-        if not filename.endswith('.json'):
-            continue
-        if filename == 'config.json':
+    try:
+        raw = _read_bytes(log_path)
+    except FileNotFoundError:
+        return
+    messages = conversation.setdefault('messages', [])
+    for line in raw.splitlines():
+        try:
+            record = _loads(line)
+        except ValueError:
             continue
-        path = os.path.join(DATA_DIR, filename)
+        if isinstance(record, dict) and record.get('g') == gen and record.get('i') == len(messages):
+            messages.append(record.get('message'))
+    _refresh_message_count(conversation)
+
+
+def _log_records(conversation: Dict[str, Any], count: int, gen: str) -> bytes:
+    """The last `count` messages of `conversation` as append-log lines for snapshot generation `gen`."""
+    messages = conversation.get('messages', [])
+    return b''.join(
+        _dumps_line({'g': gen, 'i': i, 'message': messages[i]}) + b'\n'
+        for i in range(len(messages) - count, len(messages))
+    )
+
+
+def _log_fits(path: str, size: int) -> bool:
+    """Whether `size` more bytes of log keep it no larger than its snapshot.
+
+    False when the snapshot is missing, in which case it has to be written in full.
+    """
+    try:
+        snapshot_size = os.stat(path).st_size
+    except OSError:
+        return False
+    try:
+        log_size = os.stat(_log_path(path)).st_size
+    except FileNotFoundError:
+        log_size = 0
+    return log_size + size <= snapshot_size
+
+
+def _append_log(path: str, data: bytes):
+    """Append serialized records to the log of the snapshot at `path`.
+
+    If a crash left the log without a trailing newline, the new records start
+    on a fresh line so the torn record can't swallow them.
+    """
+    fd = os.open(_log_path(path), os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), _FILE_MODE)
+    try:
+        if os.fstat(fd).st_size:
+            # O_APPEND writes always land at the end; the seek only positions this read
+            os.lseek(fd, -1, os.SEEK_END)
+            if os.read(fd, 1) != b'\n':
+                data = b'\n' + data
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        _datasync(fd)
+    finally:
+        os.close(fd)
+
+
+# Last snapshot written per conversation: id -> (`_convo_sig` after the write, digest of the bytes).
+_SNAPSHOT_DIGEST: Dict[str, tuple[tuple[int, ...], bytes]] = {}
+
+
+def _snapshot_unchanged(path: str, convo_id: str, digest: bytes) -> bool:
+    """Whether the bytes with `digest` are what was last written and the files haven't changed since."""
+    last = _SNAPSHOT_DIGEST.get(convo_id)
+    if last is None or last[1] != digest:
+        return False
+    try:
+        return _convo_sig(path) == last[0]
+    except OSError:
+        return False
+
+
+def _write_snapshot(path: str, convo_id: str, data: bytes, digest: bytes):
+    """Rewrite a conversation in full from its serialized bytes and drop its now-redundant append log."""
+    _atomic_write(path, _compress(data))
+    try:
+        os.remove(_log_path(path))
+    except FileNotFoundError:
+        pass
+    try:
+        _SNAPSHOT_DIGEST[convo_id] = (_convo_sig(path), digest)
+    except OSError:
+        _SNAPSHOT_DIGEST.pop(convo_id, None)
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+# Saved conversations waiting to be written: id -> conversation.
+_DIRTY: Dict[str, Dict[str, Any]] = {}
+# For dirty conversations whose only changes are appended messages: id -> how many.
+_APPENDED: Dict[str, int] = {}
+# Pending flush scheduled on the event loop, if any.
+_FLUSH_HANDLE: Optional[asyncio.TimerHandle] = None
+_FLUSH_DELAY = 0.05
+# Wait before a timed flush retries conversations whose write failed.
+_RETRY_DELAY = 1.0
+
+# The single thread that performs flushed writes, in submission order, so
+# fdatasync never runs on the event loop. At most one batch is in flight.
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-writer')
+# Conversations handed to the writer and not written yet: id -> conversation.
+_INFLIGHT: Dict[str, Dict[str, Any]] = {}
+# Serializes read-modify-write updates of the index between the loop and the writer.
+_INDEX_LOCK = threading.Lock()
+
+
+class _WriteBatch:
+    """Conversations serialized on the event loop and written by `_WRITER`.
+
+    Each job is (id, path, conversation, data, digest, listing metadata,
+    log generation); a job without a digest appends `data` to the log
+    instead of rewriting the snapshot.
+    """
+
+    def __init__(self, jobs: List[tuple], error: Optional[Exception]):
+        self.jobs = jobs
+        self.error = error
+        self.finished = False
         try:
-            with open(path, 'r') as f:
-                data = json.load(f)
+            self.future = _WRITER.submit(_write_batch, jobs)
+        except RuntimeError:
+            # the executor is shut down at interpreter exit: write inline
+            self.future = Future()
+            self.future.set_result(_write_batch(jobs))
+
+
+# The batch being written, if any.
+_BATCH: Optional[_WriteBatch] = None
+
+
+def save_conversation(conversation: Dict[str, Any]):
+    """Persist a conversation dictionary to disk.
+
+    Inside a running event loop the write is deferred, coalesced with any
+    other saves in the next `_FLUSH_DELAY` seconds and done on the writer
+    thread; otherwise it is immediate.
+    """
+    _APPENDED.pop(conversation['id'], None)
+    _DIRTY[conversation['id']] = conversation
+    _schedule_flush()
+
+
+def _save_appended_message(conversation: Dict[str, Any]):
+    """Like `save_conversation`, for a change that only appended one message."""
+    convo_id = conversation['id']
+    if convo_id not in _DIRTY or convo_id in _APPENDED:
+        _APPENDED[convo_id] = _APPENDED.get(convo_id, 0) + 1
+    _DIRTY[convo_id] = conversation
+    _schedule_flush()
+
+
+def _schedule_flush():
+    global _FLUSH_HANDLE
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush()
+        return
+    if _FLUSH_HANDLE is None:
+        _FLUSH_HANDLE = loop.call_later(_FLUSH_DELAY, _timed_flush)
+
+
+def _cancel_flush():
+    global _FLUSH_HANDLE
+    if _FLUSH_HANDLE is not None:
+        _FLUSH_HANDLE.cancel()
+        _FLUSH_HANDLE = None
+
+
+def _timed_flush():
+    """Timer callback: hand the pending conversations to the writer thread."""
+    global _FLUSH_HANDLE
+    _FLUSH_HANDLE = None
+    if _BATCH is not None or not _DIRTY:
+        # the batch in flight reschedules when it's done
+        return
+    batch = _start_batch()
+    loop = asyncio.get_running_loop()
+
+    def done(_):
+        try:
+            loop.call_soon_threadsafe(_batch_done, batch)
+        except RuntimeError:
+            pass  # loop closed; the flush at shutdown or exit finishes the batch
+
+    batch.future.add_done_callback(done)
+
+
+def _batch_done(batch: _WriteBatch):
+    if batch.finished:
+        # already finished by a flush that waited for it
+        return
+    if _finish_batch(batch) is None and _DIRTY:
+        _schedule_flush()
+
+
+def _start_batch() -> _WriteBatch:
+    """Serialize every pending conversation and submit the writes (event loop thread)."""
+    global _BATCH
+    pending = list(_DIRTY.values())
+    appended = dict(_APPENDED)
+    _DIRTY.clear()
+    _APPENDED.clear()
+    ensure_data_dir()
+    jobs = []
+    error: Optional[Exception] = None
+    for conversation in pending:
+        convo_id = conversation['id']
+        path = get_conversation_path(convo_id)
+        try:
+            count = appended.get(convo_id)
+            gen = _LOG_GEN.get(convo_id)
+            data = None
+            if count is not None and gen is not None:
+                data = _log_records(conversation, count, gen)
+                if not _log_fits(path, len(data)):
+                    data = None
+            digest = None
+            if data is None:
+                # a new generation whenever records of the current one may exist,
+                # so they can't be replayed onto this snapshot after a crash
+                if gen is None or os.path.exists(_log_path(path)):
+                    gen = _new_log_gen()
+                data = _dumps({**conversation, _LOG_GEN_KEY: gen})
+                digest = _digest(data)
+                if _snapshot_unchanged(path, convo_id, digest):
+                    continue
+            meta = _conversation_meta(convo_id, conversation)
         except Exception as e:
-            print(f"storage.list_conversations: skipping invalid file {path}: {e}")
+            logger.error("failed to serialize conversation %s: %s", convo_id, e)
+            _requeue(conversation)
+            error = e
             continue
+        _INFLIGHT[convo_id] = conversation
+        jobs.append((convo_id, path, conversation, data, digest, meta, gen))
+    _BATCH = _WriteBatch(jobs, error)
+    return _BATCH
 
-        # If root is a list, assume it's a list of messages and recover
-        if isinstance(data, list):
-            convo_id = os.path.splitext(filename)[0]
-            # Count completed user messages + assistant messages with completed stage3 (exclude summaries)
-            msg_count = sum(
-                1 for m in data if isinstance(m, dict) and (
-                    (m.get('role') == 'user' and m.get('status', 'complete') == 'complete') or
-                    (m.get('role') == 'assistant' and isinstance(m.get('stage3'), dict) and
-                     m.get('stage3', {}).get('response') and
-                     not m.get('stage3', {}).get('metadata', {}).get('summarized_count'))
-                )
-            )
-            conversations.append({
-                'id': convo_id,
-                'created_at': datetime.utcnow().isoformat(),
-                'title': 'Recovered Conversation',
-                'message_count': msg_count
-            })
-            continue
 
-        if not isinstance(data, dict):
-            print(f"storage.list_conversations: unexpected JSON root in {path}: {type(data)}")
+def _write_batch(jobs: List[tuple]) -> tuple[List[Any], Optional[Exception]]:
+    """Write a batch and update the index once (writer thread).
+
+    Returns the new `_convo_sig` or the exception for each job, and the
+    error from the index update if it failed.
+    """
+    results: List[Any] = []
+    changed = {}
+    for convo_id, path, _conversation, data, digest, meta, _gen in jobs:
+        try:
+            if digest is None:
+                _append_log(path, data)
+                _SNAPSHOT_DIGEST.pop(convo_id, None)
+            else:
+                _write_snapshot(path, convo_id, data, digest)
+            results.append(_convo_sig(path))
+        except Exception as e:
+            results.append(e)
             continue
+        changed[convo_id] = meta
+    try:
+        with _INDEX_LOCK:
+            index = _load_index()
+            # most saves (streamed stages, statuses) leave the listing as it was
+            changed = {k: v for k, v in changed.items() if index.get(k) != v}
+            if changed:
+                _save_index({**index, **changed}, changed)
+    except Exception as e:
+        return results, e
+    return results, None
 
-        convo_id = data.get('id') or os.path.splitext(filename)[0]
-        created_at = data.get('created_at') or datetime.utcnow().isoformat()
-        title = data.get('title', 'New Conversation')
-        messages = data.get('messages') if isinstance(data.get('messages'), list) else []
-        # Count completed user messages + assistant messages with completed stage3 (exclude summaries)
-        # A user message is "complete" if status == 'complete' OR if there's no status field (legacy)
-        msg_count = sum(
-            1 for m in messages if (
-                (m.get('role') == 'user' and m.get('status', 'complete') == 'complete') or
-                (m.get('role') == 'assistant' and isinstance(m.get('stage3'), dict) and
-                 m.get('stage3', {}).get('response') and
-                 not m.get('stage3', {}).get('metadata', {}).get('summarized_count'))
-            )
+
+def _finish_batch(batch: _WriteBatch) -> Optional[Exception]:
+    """Wait for a batch and apply its results (event loop thread); returns its last error.
+
+    Conversations that failed to write go back to pending; inside a running
+    loop a retry is scheduled after `_RETRY_DELAY`.
+    """
+    global _BATCH
+    if batch.finished:
+        return batch.error
+    results, index_error = batch.future.result()
+    batch.finished = True
+    if _BATCH is batch:
+        _BATCH = None
+    error = batch.error
+    if index_error is not None:
+        logger.error("failed to update the conversation index: %s", index_error)
+        error = index_error
+    for (convo_id, path, conversation, _data, digest, _meta, gen), result in zip(batch.jobs, results):
+        if _INFLIGHT.get(convo_id) is conversation:
+            del _INFLIGHT[convo_id]
+        if isinstance(result, Exception):
+            logger.error("failed to write conversation %s: %s", convo_id, result)
+            _requeue(conversation)
+            error = result
+        else:
+            if digest is not None:
+                _LOG_GEN[convo_id] = gen
+            _cache_put(convo_id, result, conversation)
+    batch.error = error
+    if error is not None:
+        try:
+            _schedule_retry()
+        except RuntimeError:
+            pass  # no running loop: the caller raises
+    return error
+
+
+def _schedule_retry():
+    global _FLUSH_HANDLE
+    loop = asyncio.get_running_loop()
+    if _FLUSH_HANDLE is None:
+        logger.error("retrying failed conversation writes in %ss", _RETRY_DELAY)
+        _FLUSH_HANDLE = loop.call_later(_RETRY_DELAY, _timed_flush)
+
+
+def _requeue(conversation: Dict[str, Any]):
+    """Put back a conversation whose write failed so the next flush retries it."""
+    convo_id = conversation['id']
+    # a newer save wins; either way the log may be missing messages, so rewrite in full
+    _DIRTY.setdefault(convo_id, conversation)
+    _APPENDED.pop(convo_id, None)
+    # the cache must not serve a state the disk doesn't have
+    _CONVO_CACHE.pop(convo_id, None)
+    _SNAPSHOT_DIGEST.pop(convo_id, None)
+
+
+def _drain():
+    """Block until the batch in flight, if any, is written and applied."""
+    if _BATCH is not None:
+        _finish_batch(_BATCH)
+
+
+def flush():
+    """Write every pending conversation to disk and update the index once.
+
+    Blocks until the writer thread is done, including any batch already in
+    flight. The index is only rewritten if some conversation's listing
+    metadata changed. Conversations that fail to write stay pending and the
+    last error is raised once the rest are done.
+    """
+    _cancel_flush()
+    _drain()
+    if not _DIRTY:
+        return
+    error = _finish_batch(_start_batch())
+    if error is not None:
+        raise error
+
+
+async def aflush():
+    """Like `flush`, but waits for the writer thread without blocking the event loop."""
+    while _BATCH is not None:
+        batch = _BATCH
+        await asyncio.wrap_future(batch.future)
+        _finish_batch(batch)
+    _cancel_flush()
+    if not _DIRTY:
+        return
+    batch = _start_batch()
+    await asyncio.wrap_future(batch.future)
+    error = _finish_batch(batch)
+    if error is not None:
+        raise error
+
+
+# Safety net for exits that skip the application's shutdown hook.
+atexit.register(flush)
+
+
+def _count_messages(messages: List[Any]) -> int:
+    """Count completed user messages + assistant messages with completed stage3 (exclude summaries).
+
+    A user message is "complete" if status == 'complete' OR if there's no status field (legacy).
+    """
+    return sum(
+        1 for m in messages if isinstance(m, dict) and (
+            (m.get('role') == 'user' and m.get('status', 'complete') == 'complete') or
+            (m.get('role') == 'assistant' and isinstance(m.get('stage3'), dict) and
+             m.get('stage3', {}).get('response') and
+             not m.get('stage3', {}).get('metadata', {}).get('summarized_count'))
         )
+    )
 
-        conversations.append({
+
+def _refresh_message_count(conversation: Dict[str, Any]):
+    """Store the listing message count on the conversation itself.
+
+    Called by the helpers that change a message's completeness, so listing
+    never has to walk the messages.
+    """
+    conversation['message_count'] = _count_messages(conversation.get('messages', []))
+
+
+def _conversation_meta(convo_id: str, data: Any, now: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Listing metadata for a parsed conversation file, or None if it isn't one.
+
+    Attempts to recover simple list-formatted files by treating the list as messages.
+    `now` is the created_at used for files that lack one (default: current time).
+    """
+    # If root is a list, assume it's a list of messages and recover
+    if isinstance(data, list):
+        return {
             'id': convo_id,
-            'created_at': created_at,
-            'title': title,
-            'message_count': msg_count
-        })
+            'created_at': now or _utcnow_iso(),
+            'title': 'Recovered Conversation',
+            'message_count': _count_messages(data)
+        }
 
-    conversations.sort(key=lambda x: x['created_at'], reverse=True)
-    return conversations
+    if not isinstance(data, dict):
+        return None
 
+    # Prefer the stored counter; count by hand only for files written before it existed
+    msg_count = data.get('message_count')
+    if not isinstance(msg_count, int):
+        messages = data.get('messages') if isinstance(data.get('messages'), list) else []
+        msg_count = _count_messages(messages)
+    return {
+        'id': data.get('id') or convo_id,
+        'created_at': data.get('created_at') or now or _utcnow_iso(),
+        'title': data.get('title', 'New Conversation'),
+        'message_count': msg_count
+    }
 
-def add_user_message(conversation_id: str, content: str, reply_to: str | None = None):
+
+def _conversation_files() -> List[os.DirEntry]:
+    """Directory entries of the conversation files in DATA_DIR (internal files excluded)."""
+    try:
+        it = os.scandir(DATA_DIR)
+    except FileNotFoundError:
+        # removed while running: recreate it, it is empty now
+        _forget_data_dir()
+        ensure_data_dir()
+        return []
+    with it:
+        return [entry for entry in it if _is_conversation_file(entry.name)]
+
+
+def _index_path() -> str:
+    return os.path.join(DATA_DIR, INDEX_FILENAME)
+
+
+# The index as last read or written: ((mtime_ns, size) of the file, index).
+# Updates then only serialize it instead of re-reading it first.
+_INDEX_CACHE: Optional[tuple[tuple[int, int], Dict[str, Optional[Dict[str, Any]]]]] = None
+
+
+def _load_index() -> Dict[str, Optional[Dict[str, Any]]]:
+    """Read the listing index: file stem -> metadata (None for unreadable files).
+
+    Served from memory while the file is unchanged. Returns an empty dict if
+    the index is missing or corrupt.
+    """
+    global _INDEX_CACHE
+    path = _index_path()
+    try:
+        sig = _file_sig(os.stat(path))
+    except OSError:
+        _INDEX_CACHE = None
+        return {}
+    if _INDEX_CACHE is not None and _INDEX_CACHE[0] == sig:
+        return _INDEX_CACHE[1]
+    try:
+        index = _read_json(path)
+    except Exception:
+        return {}
+    if not isinstance(index, dict):
+        return {}
+    _INDEX_CACHE = (sig, index)
+    return index
+
+
+# Count of index writes, and for each id the count when its entry last changed,
+# so a rebuild from a scan can tell which entries were updated meanwhile.
+_INDEX_GEN = 0
+_INDEX_TOUCHED: Dict[str, int] = {}
+
+
+def _touch_index(ids):
+    global _INDEX_GEN
+    _INDEX_GEN += 1
+    for convo_id in ids:
+        _INDEX_TOUCHED[convo_id] = _INDEX_GEN
+
+
+def _save_index(index: Dict[str, Optional[Dict[str, Any]]], touched=()):
+    """Write the index; callers hold `_INDEX_LOCK` and name the ids they changed.
+
+    The dict becomes the cached index, so callers pass a new dict rather
+    than editing the one `_load_index` returned, which a listing may be
+    iterating.
+    """
+    global _INDEX_CACHE
+    _touch_index(touched)
+    path = _index_path()
+    _INDEX_CACHE = None
+    _write_json(path, index)
+    try:
+        _INDEX_CACHE = (_file_sig(os.stat(path)), index)
+    except OSError:
+        _INDEX_CACHE = None
+
+
+def _update_index(conversation: Dict[str, Any]):
+    """Record a conversation's listing metadata in the index."""
+    convo_id = conversation['id']
+    with _INDEX_LOCK:
+        _save_index({**_load_index(), convo_id: _conversation_meta(convo_id, conversation)}, (convo_id,))
+
+
+def _remove_from_index(conversation_id: str):
+    with _INDEX_LOCK:
+        index = _load_index()
+        if conversation_id in index:
+            _save_index({k: v for k, v in index.items() if k != conversation_id}, (conversation_id,))
+        else:
+            # not indexed yet, but a rebuild in progress may have scanned it
+            _touch_index((conversation_id,))
+
+
+# Upper bound on threads parsing conversation files during an index rebuild;
+# directories with fewer than `_PARALLEL_MIN_FILES` files are parsed inline.
+_READ_WORKERS = 16
+_PARALLEL_MIN_FILES = 8
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _parse_one(entry: os.DirEntry, now: str) -> tuple[str, Optional[Dict[str, Any]]]:
+    """Read one conversation file and return (file stem, listing metadata or None)."""
+    convo_id = entry.name[:-len('.json')]
+    path = entry.path
+    try:
+        data = _loads(_decompress(_read_bytes(path)))
+        if isinstance(data, dict):
+            _replay_log(data, _log_path(path), data.pop(_LOG_GEN_KEY, None))
+    except Exception as e:
+        logger.warning("skipping invalid file %s: %s", path, e)
+        return convo_id, None
+    meta = _conversation_meta(convo_id, data, now)
+    if meta is None:
+        logger.warning("unexpected JSON root in %s: %s", path, type(data))
+    return convo_id, meta
+
+
+def _scan_metadata(entries: List[os.DirEntry]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Listing metadata for every conversation file, as stored in the index.
+
+    Files are read and parsed on a small thread pool so their I/O overlaps.
+    Non-JSON or malformed files are recorded as None so they don't make the
+    index look stale on the next call.
+    """
+    # one timestamp for every file that lacks its own created_at
+    parse = functools.partial(_parse_one, now=_utcnow_iso())
+    if len(entries) < _PARALLEL_MIN_FILES:
+        return dict(map(parse, entries))
+    with ThreadPoolExecutor(max_workers=min(_READ_WORKERS, len(entries))) as pool:
+        return dict(pool.map(parse, entries))
+
+
+def _store_rebuilt_index(
+    index: Dict[str, Optional[Dict[str, Any]]],
+    since: int
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Save an index produced by `_scan_metadata` and drop the legacy index file.
+
+    `since` is `_INDEX_GEN` from before the scan: entries written to the
+    index after it, and conversations saved but not written yet, are newer
+    than what the scan read and replace its results.
+    """
+    with _INDEX_LOCK:
+        current = _load_index()
+        for convo_id, gen in _INDEX_TOUCHED.items():
+            if gen <= since:
+                continue
+            if convo_id in current:
+                index[convo_id] = current[convo_id]
+            else:
+                index.pop(convo_id, None)
+        for conversation in (*_INFLIGHT.values(), *_DIRTY.values()):
+            convo_id = conversation['id']
+            index[convo_id] = _conversation_meta(convo_id, conversation)
+        _save_index(index)
+    try:
+        os.remove(os.path.join(DATA_DIR, 'conversation_index.json'))
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def _rebuild_index(entries: List[os.DirEntry]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Scan every conversation file and write a fresh index."""
+    since = _INDEX_GEN
+    return _store_rebuilt_index(_scan_metadata(entries), since)
+
+
+def _index_matches(index: Dict[str, Any], entries: List[os.DirEntry]) -> bool:
+    return set(index) == {entry.name[:-len('.json')] for entry in entries}
+
+
+_BY_CREATED = operator.itemgetter('created_at')
+
+
+def _listing(index: Dict[str, Optional[Dict[str, Any]]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Newest-first copies of the index entries; only the newest `limit` when given."""
+    metas = [meta for meta in index.values() if meta is not None]
+    if limit is None:
+        metas.sort(key=_BY_CREATED, reverse=True)
+    else:
+        metas = heapq.nlargest(limit, metas, key=_BY_CREATED)
+    return [dict(meta) for meta in metas]
+
+
+def list_conversations(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return metadata for stored conversations, newest first.
+
+    Served from the index; falls back to rescanning the directory when the
+    index is missing or doesn't cover exactly the files on disk. With
+    `limit`, only the newest `limit` conversations are selected (O(N log K)).
+    """
+    flush()
+    ensure_data_dir()
+    entries = _conversation_files()
+    index = _load_index()
+    if not _index_matches(index, entries):
+        index = _rebuild_index(entries)
+    return _listing(index, limit)
+
+
+async def alist_conversations(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Async variant of `list_conversations` for request handlers.
+
+    When the index has to be rebuilt, the files are read and parsed in a
+    worker thread instead of on the event loop.
+    """
+    await aflush()
+    ensure_data_dir()
+    entries = _conversation_files()
+    index = _load_index()
+    if not _index_matches(index, entries):
+        since = _INDEX_GEN
+        index = _store_rebuilt_index(await asyncio.to_thread(_scan_metadata, entries), since)
+    return _listing(index, limit)
+
+
+def _mutate(
+    conversation_id: str,
+    mutator: Callable[[Dict[str, Any]], Any],
+    appended: bool = False
+) -> Any:
+    """Load a conversation, apply `mutator` to it in place and save it.
+
+    With the in-memory cache and write buffer this is a dict update plus a
+    dirty mark; no file is read or written synchronously on a cache hit.
+    Pass `appended=True` when the mutator only appends one message, so the
+    flush can append it to the log. Returns whatever `mutator` returns.
+    """
     conversation = get_conversation(conversation_id)
     if conversation is None:
         raise ValueError(f"Conversation {conversation_id} not found")
+    result = mutator(conversation)
+    if appended:
+        _save_appended_message(conversation)
+    else:
+        save_conversation(conversation)
+    return result
+
+
+def add_user_message(conversation_id: str, content: str, reply_to: str | None = None):
     message = {
         'role': 'user',
         'content': content,
         'status': 'pending',
-        'created_at': datetime.utcnow().isoformat()
+        'created_at': _utcnow_iso()
     }
     if reply_to:
         message['reply_to'] = reply_to
-    conversation.setdefault('messages', []).append(message)
-    save_conversation(conversation)
+    _mutate(conversation_id, lambda c: c.setdefault('messages', []).append(message), appended=True)
 
 
 def mark_last_user_message_status(conversation_id: str, status: str):
@@ -163,7 +1070,8 @@ def mark_last_user_message_status(conversation_id: str, status: str):
     for m in reversed(msgs):
         if m.get('role') == 'user':
             m['status'] = status
-            m['status_updated_at'] = datetime.utcnow().isoformat()
+            m['status_updated_at'] = _utcnow_iso()
+            _refresh_message_count(conversation)
             save_conversation(conversation)
             return True
     return False
@@ -220,9 +1128,6 @@ def add_assistant_message(
     stage3: Dict[str, Any],
     skip_stages: bool = False
 ):
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
     msg = {
         'role': 'assistant',
         'stage1': stage1,
@@ -231,20 +1136,31 @@ def add_assistant_message(
     }
     if skip_stages:
         msg['skipStages'] = True
-    conversation.setdefault('messages', []).append(msg)
-    save_conversation(conversation)
+
+    def _append(conversation: Dict[str, Any]):
+        conversation.setdefault('messages', []).append(msg)
+        _refresh_message_count(conversation)
+
+    _mutate(conversation_id, _append, appended=True)
 
 
 def update_conversation_title(conversation_id: str, title: str):
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-    conversation['title'] = title
-    save_conversation(conversation)
+    _mutate(conversation_id, lambda c: c.update(title=title))
 
 
 def delete_conversation(conversation_id: str):
     """Delete a conversation file."""
+    # a write still in flight would bring the files back
+    _drain()
+    _DIRTY.pop(conversation_id, None)
+    _APPENDED.pop(conversation_id, None)
+    _SNAPSHOT_DIGEST.pop(conversation_id, None)
+    _LOG_GEN.pop(conversation_id, None)
+    _CONVO_CACHE.pop(conversation_id, None)
     path = get_conversation_path(conversation_id)
-    if os.path.exists(path):
-        os.remove(path)
+    for p in (path, _log_path(path)):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+    _remove_from_index(conversation_id)